@@ -1,6 +1,13 @@
+import asyncio
 from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from apps.api.routers import reports, clients, disputes, ai
+from apps.api.services import pdf_extraction, report_db
+from apps.api.services.report_search import search_index
+from apps.api.services.llm_cache import llm_cache
+from apps.api.ollama_client import ollama_client
+from apps.api.services.llm_admission import QueueFullError
 
 app = FastAPI(title="UFML API", version="0.1.0")
 
@@ -14,6 +21,12 @@ app.add_middleware(
     expose_headers=["X-Request-ID"],
 )
 
+@app.exception_handler(QueueFullError)
+async def _llm_queue_full(request: Request, exc: QueueFullError):
+    # Shed load fast instead of letting requests pile up until they time out
+    return JSONResponse({"detail": str(exc)}, status_code=429,
+                        headers={"Retry-After": str(exc.retry_after)})
+
 @app.get("/healthz")
 def healthz():
     return {"ok": True}
@@ -23,6 +36,19 @@ def healthz():
 async def _boot():
     print(">>> UFML API STARTED WITH CORS ENABLED <<<")
     print(">>> Allow Origins: http://127.0.0.1:3000, http://localhost:3000 <<<")
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, report_db.ensure_schema)
+    # Index reports uploaded before search existed, without delaying startup
+    loop.run_in_executor(None, reports.backfill_search_index)
+
+@app.on_event("shutdown")
+async def _shutdown():
+    pdf_extraction.shutdown_pool()
+    reports.REPORTS.close()
+    search_index.close()
+    await ollama_client.aclose()
+    if llm_cache is not None:
+        llm_cache.close()
 
 app.include_router(reports.router, prefix="/reports", tags=["reports"])
 app.include_router(clients.router, prefix="/clients", tags=["clients"])
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Move flat ./report_{id}.txt files into the sharded report text store
+Run from the repository root (where the API server runs):
+
+    python apps/api/migrate_report_texts.py [--compression gzip] [--dry-run]
+"""
+
+import os
+import re
+import sys
+import shutil
+import argparse
+from pathlib import Path
+
+# Add the current directory to Python path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from services.text_store import ReportTextStore, REPORT_TEXT_DIR, REPORT_TEXT_COMPRESSION
+
+LEGACY_NAME = re.compile(r"^report_(.+)\.txt$")
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate flat report text files into the sharded store")
+    parser.add_argument("--source-dir", default=".", help="Directory holding report_{id}.txt files")
+    parser.add_argument("--root", default=REPORT_TEXT_DIR, help="Store root directory")
+    parser.add_argument("--compression", default=REPORT_TEXT_COMPRESSION, choices=["none", "gzip", "zstd"])
+    parser.add_argument("--dry-run", action="store_true", help="List what would be moved")
+    args = parser.parse_args()
+
+    # legacy_dir=None: the store must not treat the source files as already stored
+    store = ReportTextStore(root=args.root, compression=args.compression, legacy_dir=None)
+    moved = skipped = failed = 0
+    bytes_in = bytes_out = 0
+
+    for entry in sorted(os.scandir(args.source_dir), key=lambda e: e.name):
+        match = LEGACY_NAME.match(entry.name)
+        if not entry.is_file() or not match:
+            continue
+        report_id = match.group(1)
+        if store.exists(report_id):
+            print(f"skip   {entry.name} (already in store)")
+            skipped += 1
+            continue
+        if args.dry_run:
+            print(f"would  {entry.name} -> {store.path_for(report_id)}")
+            continue
+        try:
+            with open(entry.path, "rb") as src, store.open_write(report_id) as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+            bytes_in += entry.stat().st_size
+            bytes_out += os.path.getsize(store.path_for(report_id))
+            os.remove(entry.path)
+            moved += 1
+            print(f"moved  {entry.name} -> {store.path_for(report_id)}")
+        except Exception as e:
+            failed += 1
+            print(f"failed {entry.name}: {e}")
+
+    print(f"\nMoved {moved}, skipped {skipped}, failed {failed}")
+    if moved:
+        print(f"{bytes_in} bytes -> {bytes_out} bytes on disk")
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,18 @@
-from sqlalchemy import Column, String, Date, DateTime, ForeignKey, Integer, Text, JSON
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, String, Date, DateTime, ForeignKey, Integer, Text, JSON, Index
+from sqlalchemy.dialects.postgresql import UUID, JSONB
 from .base import Base
 import uuid
 
 class CreditReport(Base):
     __tablename__ = "credit_reports"
+    __table_args__ = (
+        Index("ix_credit_reports_user_id", "user_id"),
+        Index("ix_credit_reports_report_date", "report_date"),
+    )
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"))
     bureau = Column(String)
     report_date = Column(Date)
     raw_pdf_url = Column(Text)
-    parsed_json = Column(JSON)
+    parsed_json = Column(JSON().with_variant(JSONB(), "postgresql"))
     created_at = Column(DateTime)
@@ -4,67 +4,663 @@ Handles model selection, timeouts, retries, and error handling
 """
 
 import os
+import json
 import time
+import asyncio
+import threading
+import httpx
 import requests
-from typing import Optional, Dict, Any
+from requests.adapters import HTTPAdapter
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, AsyncIterator, Iterator, List, Set, Tuple
 import logging
 
+from apps.api.services.llm_cache import llm_cache, cache_key
+from apps.api.services.llm_admission import llm_admission, PRIORITY_INTERACTIVE, PRIORITY_PROBE, OLLAMA_MAX_CONCURRENT
+from apps.api.services.llm_circuit import CircuitBreaker, LatencyTracker
+
 logger = logging.getLogger(__name__)
 
+# How long a probe result is trusted. Outages are re-checked sooner so a
+# restarted server is noticed quickly.
+OLLAMA_HEALTH_TTL_SECONDS = float(os.getenv("OLLAMA_HEALTH_TTL_SECONDS", "30"))
+OLLAMA_HEALTH_DOWN_TTL_SECONDS = float(os.getenv("OLLAMA_HEALTH_DOWN_TTL_SECONDS", "5"))
+
+# Keep-alive connections kept per host; match the number of generations
+# expected in flight (LLM_MAX_CONCURRENT_CHUNKS plus concurrent requests)
+OLLAMA_POOL_SIZE = int(os.getenv("OLLAMA_POOL_SIZE", "8"))
+
+HEALTH_UNKNOWN = "unknown"
+HEALTH_UP = "up"
+HEALTH_DOWN = "down"
+
+def _configured_hosts() -> List[str]:
+    """OLLAMA_HOSTS (comma-separated) if set, else the single OLLAMA_HOST"""
+    hosts = [h.strip().rstrip("/") for h in os.getenv("OLLAMA_HOSTS", "").split(",") if h.strip()]
+    return hosts or [os.getenv("OLLAMA_HOST", "http://127.0.0.1:11434").rstrip("/")]
+
+def _serves(models: List[str], model: str) -> bool:
+    # Ollama lists untagged pulls as "<name>:latest"
+    return model in models or (":" not in model and f"{model}:latest" in models)
+
+class OllamaHost:
+    """
+    One Ollama server: its health, installed models, circuit breaker,
+    latency history and the number of requests currently sent to it
+    """
+
+    def __init__(self, url: str, model: str, index: int):
+        self.url = url
+        self.model = model
+        self.index = index
+        self.outstanding = 0
+        self.requests = 0
+        self.breaker = CircuitBreaker()
+        self.latency = LatencyTracker()
+
+        # Availability state machine: unknown -> up/down, updated by probes
+        # and passively by every generation outcome
+        self.health_state = HEALTH_UNKNOWN
+        self.health_checked_at = 0.0
+        self.models: Optional[List[str]] = None
+        self._health_lock = threading.Lock()
+        self._refreshing = False
+
+    def has_model(self) -> Optional[bool]:
+        """Whether the configured model is installed here; None until probed"""
+        models = self.models
+        return None if models is None else _serves(models, self.model)
+
+    def usable(self) -> bool:
+        return self.health_state == HEALTH_UP and self.has_model() is not False
+
+    def routable(self) -> bool:
+        """Worth sending a request to: not known down, not missing the model, circuit not open"""
+        return (self.health_state != HEALTH_DOWN and self.has_model() is not False
+                and not self.breaker.blocked())
+
+    def claim_refresh(self) -> bool:
+        """True (once) when the health state is stale and a refresh should start"""
+        with self._health_lock:
+            if self.health_state == HEALTH_UNKNOWN or self._refreshing:
+                return False
+            ttl = OLLAMA_HEALTH_TTL_SECONDS if self.health_state == HEALTH_UP else OLLAMA_HEALTH_DOWN_TTL_SECONDS
+            if time.time() - self.health_checked_at < ttl:
+                return False
+            self._refreshing = True
+            return True
+
+    def refresh_done(self):
+        with self._health_lock:
+            self._refreshing = False
+
+    def mark(self, available: bool, models: Optional[List[str]] = None):
+        with self._health_lock:
+            state = HEALTH_UP if available else HEALTH_DOWN
+            if state != self.health_state:
+                logger.info(f"Ollama health {self.url}: {self.health_state} -> {state}")
+            self.health_state = state
+            self.health_checked_at = time.time()
+            if models is not None:
+                if self.models is not None and _serves(self.models, self.model) != _serves(models, self.model):
+                    logger.info(f"Ollama {self.url}: model {self.model} "
+                                f"{'available' if _serves(models, self.model) else 'missing'}")
+                self.models = models
+
+    def record_tags(self, response) -> bool:
+        """Update health and models from an /api/tags response"""
+        if response.status_code != 200:
+            self.mark(False)
+            return False
+        models = [model["name"] for model in response.json().get("models", [])]
+        self.mark(True, models)
+        return _serves(models, self.model)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "host": self.url,
+            "health": self.health_state,
+            "model_available": self.has_model(),
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "circuit": self.breaker.state
+        }
+
 class OllamaClient:
     def __init__(self):
-        self.host = os.getenv("OLLAMA_HOST", "http://127.0.0.1:11434")
         self.model = os.getenv("OLLAMA_MODEL", "llama3.2:3b")
+        self.hosts = [OllamaHost(url, self.model, i) for i, url in enumerate(_configured_hosts())]
+        # First host, for logging and single-host callers
+        self.host = self.hosts[0].url
+        # Read timeout until enough latencies are observed to size it adaptively
         self.timeout = int(os.getenv("OLLAMA_TIMEOUT_SECONDS", "20"))
         self.connect_timeout = 2
         self.max_retries = 2
-        
-        logger.info(f"OllamaClient initialized: {self.host}, model: {self.model}, timeout: {self.timeout}s")
-    
+
+        # Each host runs OLLAMA_MAX_CONCURRENT generations, so the admission
+        # queue admits that many per routable host (see _sync_capacity)
+        llm_admission.set_capacity(OLLAMA_MAX_CONCURRENT * len(self.hosts))
+        self._route_lock = threading.Lock()
+        self._next_index = 0
+
+        # One pooled session so generations reuse keep-alive connections;
+        # pool_block=False opens (and later discards) extra connections
+        # rather than stalling when the pool is exhausted
+        self.session = requests.Session()
+        self._adapter = HTTPAdapter(pool_connections=len(self.hosts), pool_maxsize=OLLAMA_POOL_SIZE)
+        self.session.mount("http://", self._adapter)
+        self.session.mount("https://", self._adapter)
+        # Async counterpart for event-loop callers, created on first use
+        self._async_client: Optional[httpx.AsyncClient] = None
+        self._async_loop = None
+
+        # Single flight: identical generations already running, by cache key
+        self._flights: Dict[str, Future] = {}
+        self._flights_lock = threading.Lock()
+        # Callers still waiting on each flight, and the task running async ones
+        self._flight_waiters: Dict[Future, int] = {}
+        self._flight_tasks: Dict[Future, asyncio.Task] = {}
+        self.coalesced = 0
+
+        logger.info(f"OllamaClient initialized: {', '.join(h.url for h in self.hosts)}, "
+                    f"model: {self.model}, timeout: {self.timeout}s")
+
     def is_available(self) -> bool:
-        """Check if Ollama is running and accessible"""
+        """
+        Whether any host is up and has the model, from cached health state
+
+        Hosts never checked are probed synchronously on the first call.
+        Once a host's state is older than its TTL the last known answer is
+        still used and a single background probe refreshes it.
+        """
+        for host in self.hosts:
+            if host.health_state == HEALTH_UNKNOWN:
+                self._probe_host(host)
+            elif host.claim_refresh():
+                threading.Thread(target=self._background_probe, args=(host,),
+                                 name="ollama-health", daemon=True).start()
+        return any(host.usable() for host in self.hosts)
+
+    def probe(self) -> bool:
+        """Check every host now with a round trip to /api/tags"""
+        results = [self._probe_host(host) for host in self.hosts]
+        return any(results)
+
+    def _probe_host(self, host: OllamaHost) -> bool:
         try:
-            response = requests.get(
-                f"{self.host}/api/tags", 
+            response = self.session.get(
+                f"{host.url}/api/tags",
                 timeout=self.connect_timeout
             )
-            return response.status_code == 200
+            return host.record_tags(response)
         except Exception as e:
-            logger.warning(f"Ollama not available: {e}")
+            logger.warning(f"Ollama not available at {host.url}: {e}")
+            host.mark(False)
             return False
-    
+
+    def _background_probe(self, host: OllamaHost):
+        try:
+            self._probe_host(host)
+        finally:
+            host.refresh_done()
+
     def get_available_models(self) -> list[str]:
-        """Get list of available Ollama models"""
+        """Get list of models available on any host"""
+        self.probe()
+        return sorted({name for host in self.hosts for name in (host.models or [])})
+
+    def _pick_host(self, tried: Set[OllamaHost]) -> Optional[OllamaHost]:
+        """
+        Least-outstanding-requests routing over healthy hosts with the model
+
+        Hosts already running OLLAMA_MAX_CONCURRENT requests are full: more
+        would only queue on the server and time out. Hosts already tried for
+        this request are avoided while others are left; ties go round-robin
+        so idle hosts share the load. The chosen host's circuit breaker must
+        admit the call (in half-open only the trial request gets through).
+        """
+        with self._route_lock:
+            n = len(self.hosts)
+            candidates = [h for h in self.hosts if h.routable() and h.outstanding < OLLAMA_MAX_CONCURRENT]
+            fresh = [h for h in candidates if h not in tried]
+            candidates = fresh or candidates
+            candidates.sort(key=lambda h: (h.outstanding, (h.index - self._next_index) % n))
+            for host in candidates:
+                if host.breaker.allow():
+                    host.outstanding += 1
+                    host.requests += 1
+                    self._next_index = (host.index + 1) % n
+                    return host
+        return None
+
+    @contextmanager
+    def _routed(self, tried: Set[OllamaHost]) -> Iterator[Optional[OllamaHost]]:
+        host = self._pick_host(tried)
+        if host is not None:
+            tried.add(host)
         try:
-            response = requests.get(
-                f"{self.host}/api/tags", 
-                timeout=self.connect_timeout
-            )
-            if response.status_code == 200:
-                data = response.json()
-                return [model["name"] for model in data.get("models", [])]
-            return []
-        except Exception as e:
-            logger.error(f"Failed to get Ollama models: {e}")
-            return []
-    
-    def generate(self, prompt: str, max_tokens: int = 512, temperature: float = 0.1) -> Optional[str]:
+            yield host
+        finally:
+            if host is not None:
+                with self._route_lock:
+                    host.outstanding -= 1
+            self._sync_capacity()
+
+    def _sync_capacity(self):
+        # Admission slots follow the hosts that can take requests, so a lost
+        # host's share is not piled onto the others
+        routable = sum(1 for host in self.hosts if host.routable())
+        capacity = OLLAMA_MAX_CONCURRENT * max(1, routable)
+        if capacity != llm_admission.max_concurrent:
+            logger.info(f"Ollama admission capacity: {llm_admission.max_concurrent} -> {capacity} "
+                        f"({routable}/{len(self.hosts)} hosts routable)")
+            llm_admission.set_capacity(capacity)
+
+    def _untried_host(self, tried: Set[OllamaHost]) -> bool:
+        # A retry on a different host needs no backoff
+        return any(host.routable() and host not in tried for host in self.hosts)
+
+    def _routable(self) -> bool:
+        self._sync_capacity()
+        if any(host.routable() for host in self.hosts):
+            return True
+        # Don't take a queue slot just to be rejected
+        logger.warning("No Ollama host available (down, missing the model, or circuit open)")
+        return False
+
+    def _record_response(self, host: OllamaHost, status_code: int, text: str) -> bool:
+        """Account a non-200 answer; returns whether another attempt could help"""
+        logger.error(f"Ollama API error from {host.url}: {status_code} - {text}")
+        if status_code == 404 and "not found" in text:
+            # The model was removed since the last probe: stop routing here
+            host.mark(True, [])
+            host.breaker.record_success()
+            return True
+        if status_code < 500:
+            # The request was wrong, not the server; retrying won't help
+            host.breaker.record_success()
+            return False
+        host.breaker.record_failure()
+        return True
+
+    def generate(self, prompt: str, max_tokens: int = 512, temperature: float = 0.1,
+                 use_cache: bool = True, priority: int = PRIORITY_INTERACTIVE) -> Optional[str]:
         """
         Generate text using Ollama with retries and proper error handling
-        
+
         Args:
             prompt: The input prompt
             max_tokens: Maximum tokens to generate
             temperature: Sampling temperature (0.0 to 1.0)
-            
+            use_cache: Serve an identical earlier generation from the response
+                cache; False always calls the model (and refreshes the cache)
+            priority: Admission class (llm_admission.PRIORITY_*)
+
         Returns:
             Generated text or None if failed
+
+        Raises:
+            QueueFullError: The admission queue is full or the wait timed out
         """
+        payload = self._payload(prompt, max_tokens, temperature)
+        flight_key = cache_key(self.model, payload["options"], prompt)
+        key = flight_key if llm_cache is not None else None
+        if key is not None and use_cache:
+            cached = llm_cache.get(key)
+            if cached is not None:
+                logger.info(f"Ollama cache hit: {len(cached)} chars")
+                return cached
+
+        flight, leader = self._join_flight(flight_key)
+        if not leader:
+            return flight.result()
+        try:
+            result = self._generate_uncached(payload, key, priority)
+        except BaseException as e:
+            self._end_flight(flight_key, flight, error=e)
+            raise
+        self._end_flight(flight_key, flight, result=result)
+        return result
+
+    def _generate_uncached(self, payload: Dict[str, Any], key: Optional[str], priority: int) -> Optional[str]:
         if not self.is_available():
             logger.error("Ollama not available")
             return None
-        
-        payload = {
+        if not self._routable():
+            return None
+
+        return self._generate_with_retries(payload, key, priority)
+
+    def _generate_with_retries(self, payload: Dict[str, Any], key: Optional[str], priority: int) -> Optional[str]:
+        """
+        Attempts across hosts, each holding an admission slot only while it
+        talks to Ollama; backoff between attempts holds no slot
+        """
+        max_tokens = payload["options"]["num_predict"]
+        tried: Set[OllamaHost] = set()
+        for attempt in range(self.max_retries + 1):
+            with llm_admission.slot(priority), self._routed(tried) as host:
+                if host is None:
+                    logger.warning("No Ollama host available, failing fast")
+                    return None
+                read_timeout = host.latency.timeout(max_tokens, self.timeout)
+                try:
+                    start_time = time.time()
+
+                    response = self.session.post(
+                        f"{host.url}/api/generate",
+                        json=payload,
+                        timeout=(self.connect_timeout, read_timeout)
+                    )
+
+                    end_time = time.time()
+                    duration = end_time - start_time
+                    # Any HTTP answer proves the server is up
+                    host.mark(True)
+
+                    if response.status_code == 200:
+                        host.breaker.record_success()
+                        host.latency.observe(max_tokens, duration)
+                        generated_text = self._generated_text(response.json(), duration)
+                        if generated_text and key is not None:
+                            llm_cache.put(key, self.model, generated_text)
+                        return generated_text
+                    elif not self._record_response(host, response.status_code, response.text):
+                        return None
+
+                except requests.exceptions.Timeout:
+                    # A slow model is not an outage; leave the health state alone
+                    host.breaker.record_failure()
+                    host.latency.observe_timeout(max_tokens, read_timeout)
+                    logger.error(f"Ollama timeout from {host.url} after {read_timeout:.1f}s "
+                                 f"(attempt {attempt + 1}/{self.max_retries + 1})")
+
+                except requests.exceptions.ConnectionError as e:
+                    host.breaker.record_failure()
+                    host.mark(False)
+                    logger.error(f"Ollama connection error to {host.url} "
+                                 f"(attempt {attempt + 1}/{self.max_retries + 1}): {e}")
+
+                except Exception as e:
+                    logger.error(f"Unexpected Ollama error: {e}")
+                    return None
+
+            if attempt < self.max_retries and not self._untried_host(tried):
+                time.sleep(1)  # Brief delay before retrying a host that failed
+
+        logger.error("Ollama generation failed after all retries")
+        return None
+
+    async def agenerate(self, prompt: str, max_tokens: int = 512, temperature: float = 0.1,
+                        use_cache: bool = True, priority: int = PRIORITY_INTERACTIVE) -> Optional[str]:
+        """
+        Async generate(): same caching, retries, timeouts and coalescing,
+        without blocking the event loop for the length of the generation
+
+        The generation runs as its own task, so a caller that disconnects
+        does not cancel it for the others sharing it; once every caller has
+        gone it is cancelled, giving back its queue position or model slot.
+        """
+        payload = self._payload(prompt, max_tokens, temperature)
+        flight_key = cache_key(self.model, payload["options"], prompt)
+        key = flight_key if llm_cache is not None else None
+        if key is not None and use_cache:
+            cached = await asyncio.to_thread(llm_cache.get, key)
+            if cached is not None:
+                logger.info(f"Ollama cache hit: {len(cached)} chars")
+                return cached
+
+        flight, leader = self._join_flight(flight_key)
+        if leader:
+            task = asyncio.ensure_future(self._agenerate_uncached(payload, key, priority))
+            with self._flights_lock:
+                self._flight_tasks[flight] = task
+            task.add_done_callback(lambda t: self._end_flight(
+                flight_key, flight,
+                result=None if t.cancelled() or t.exception() else t.result(),
+                error=None if t.cancelled() else t.exception(),
+            ))
+        # shield: a cancelled waiter must not cancel the shared future
+        try:
+            return await asyncio.shield(asyncio.wrap_future(flight))
+        except asyncio.CancelledError:
+            self._leave_flight(flight_key, flight)
+            raise
+
+    async def _agenerate_uncached(self, payload: Dict[str, Any], key: Optional[str], priority: int) -> Optional[str]:
+        if not await self.ais_available():
+            logger.error("Ollama not available")
+            return None
+        if not self._routable():
+            return None
+
+        return await self._agenerate_with_retries(payload, key, priority)
+
+    async def _agenerate_with_retries(self, payload: Dict[str, Any], key: Optional[str],
+                                      priority: int) -> Optional[str]:
+        client = self._get_async_client()
+        max_tokens = payload["options"]["num_predict"]
+        tried: Set[OllamaHost] = set()
+        for attempt in range(self.max_retries + 1):
+            async with llm_admission.aslot(priority):
+                with self._routed(tried) as host:
+                    if host is None:
+                        logger.warning("No Ollama host available, failing fast")
+                        return None
+                    read_timeout = host.latency.timeout(max_tokens, self.timeout)
+                    try:
+                        start_time = time.time()
+                        response = await client.post(f"{host.url}/api/generate", json=payload,
+                                                     timeout=httpx.Timeout(read_timeout, connect=self.connect_timeout))
+                        duration = time.time() - start_time
+                        # Any HTTP answer proves the server is up
+                        host.mark(True)
+
+                        if response.status_code == 200:
+                            host.breaker.record_success()
+                            host.latency.observe(max_tokens, duration)
+                            generated_text = self._generated_text(response.json(), duration)
+                            if generated_text and key is not None:
+                                await asyncio.to_thread(llm_cache.put, key, self.model, generated_text)
+                            return generated_text
+                        elif not self._record_response(host, response.status_code, response.text):
+                            return None
+
+                    except httpx.TimeoutException:
+                        # A slow model is not an outage; leave the health state alone
+                        host.breaker.record_failure()
+                        host.latency.observe_timeout(max_tokens, read_timeout)
+                        logger.error(f"Ollama timeout from {host.url} after {read_timeout:.1f}s "
+                                     f"(attempt {attempt + 1}/{self.max_retries + 1})")
+
+                    except httpx.TransportError as e:
+                        host.breaker.record_failure()
+                        host.mark(False)
+                        logger.error(f"Ollama connection error to {host.url} "
+                                     f"(attempt {attempt + 1}/{self.max_retries + 1}): {e}")
+
+                    except Exception as e:
+                        logger.error(f"Unexpected Ollama error: {e}")
+                        return None
+
+            if attempt < self.max_retries and not self._untried_host(tried):
+                await asyncio.sleep(1)  # Brief delay before retrying a host that failed
+
+        logger.error("Ollama generation failed after all retries")
+        return None
+
+    async def astream_generate(self, prompt: str, max_tokens: int = 512, temperature: float = 0.1,
+                               use_cache: bool = True, priority: int = PRIORITY_INTERACTIVE) -> AsyncIterator[str]:
+        """
+        Generate text as a stream of fragments from Ollama's NDJSON stream
+
+        Connection failures are retried like agenerate() until the first
+        fragment arrives; after that an error just ends the stream early.
+        A cached generation is yielded as a single fragment, and a complete
+        streamed generation is cached like a normal one.
+        """
+        payload = self._payload(prompt, max_tokens, temperature)
+        payload["stream"] = True
+        key = cache_key(self.model, payload["options"], prompt) if llm_cache is not None else None
+        if key is not None and use_cache:
+            cached = await asyncio.to_thread(llm_cache.get, key)
+            if cached is not None:
+                logger.info(f"Ollama cache hit: {len(cached)} chars")
+                yield cached
+                return
+
+        if not await self.ais_available():
+            logger.error("Ollama not available")
+            return
+        if not self._routable():
+            return
+
+        async for fragment in self._astream_with_retries(payload, key, priority):
+            yield fragment
+
+    async def _astream_with_retries(self, payload: Dict[str, Any], key: Optional[str],
+                                    priority: int) -> AsyncIterator[str]:
+        client = self._get_async_client()
+        pieces = []
+        tried: Set[OllamaHost] = set()
+        for attempt in range(self.max_retries + 1):
+            async with llm_admission.aslot(priority):
+                with self._routed(tried) as host:
+                    if host is None:
+                        logger.warning("No Ollama host available, failing fast")
+                        return
+                    try:
+                        start_time = time.time()
+                        async with client.stream("POST", f"{host.url}/api/generate", json=payload) as response:
+                            host.mark(True)
+                            if response.status_code != 200:
+                                body = (await response.aread()).decode(errors="replace")
+                                if self._record_response(host, response.status_code, body) and attempt < self.max_retries:
+                                    continue
+                                return
+                            host.breaker.record_success()
+                            done = False
+                            async for line in response.aiter_lines():
+                                if not line.strip():
+                                    continue
+                                message = json.loads(line)
+                                if message.get("error"):
+                                    logger.error(f"Ollama stream error from {host.url}: {message['error']}")
+                                    return
+                                fragment = message.get("response", "")
+                                if fragment:
+                                    pieces.append(fragment)
+                                    yield fragment
+                                if message.get("done"):
+                                    done = True
+                                    break
+                        if done:
+                            generated_text = self._generated_text({"response": "".join(pieces)}, time.time() - start_time)
+                            if generated_text and key is not None:
+                                await asyncio.to_thread(llm_cache.put, key, self.model, generated_text)
+                        return
+
+                    except (httpx.TimeoutException, httpx.TransportError) as e:
+                        host.breaker.record_failure()
+                        if pieces:
+                            logger.error(f"Ollama stream from {host.url} interrupted after {len(pieces)} fragments: {e}")
+                            return
+                        logger.error(f"Ollama stream error from {host.url} "
+                                     f"(attempt {attempt + 1}/{self.max_retries + 1}): {e}")
+                        if not isinstance(e, httpx.TimeoutException):
+                            host.mark(False)
+
+                    except Exception as e:
+                        logger.error(f"Unexpected Ollama error: {e}")
+                        return
+
+            if attempt < self.max_retries and not self._untried_host(tried):
+                await asyncio.sleep(1)
+
+    def _join_flight(self, flight_key: str) -> Tuple[Future, bool]:
+        """
+        The in-flight generation for an identical request, or a new one
+
+        Returns (future, leader); only the leader calls the model and
+        everyone else waits on its future.
+        """
+        with self._flights_lock:
+            flight = self._flights.get(flight_key)
+            if flight is not None:
+                self.coalesced += 1
+                self._flight_waiters[flight] += 1
+                return flight, False
+            flight = self._flights[flight_key] = Future()
+            self._flight_waiters[flight] = 1
+            return flight, True
+
+    def _leave_flight(self, flight_key: str, flight: Future):
+        """An async caller stopped waiting; the last one out cancels the generation"""
+        with self._flights_lock:
+            # The flight already finished; _end_flight cleaned up after it
+            if flight not in self._flight_waiters:
+                return
+            self._flight_waiters[flight] -= 1
+            if self._flight_waiters[flight] > 0:
+                return
+            # Later identical requests start a fresh flight
+            if self._flights.get(flight_key) is flight:
+                del self._flights[flight_key]
+            task = self._flight_tasks.get(flight)
+        if task is not None and not task.done():
+            task.get_loop().call_soon_threadsafe(task.cancel)
+
+    def _end_flight(self, flight_key: str, flight: Future, result: Optional[str] = None,
+                    error: Optional[BaseException] = None):
+        with self._flights_lock:
+            if self._flights.get(flight_key) is flight:
+                del self._flights[flight_key]
+            self._flight_waiters.pop(flight, None)
+            self._flight_tasks.pop(flight, None)
+        if error is not None:
+            flight.set_exception(error)
+        else:
+            flight.set_result(result)
+
+    async def ais_available(self) -> bool:
+        """is_available() that probes never-checked hosts asynchronously"""
+        unknown = [host for host in self.hosts if host.health_state == HEALTH_UNKNOWN]
+        if unknown:
+            await asyncio.gather(*(self._aprobe_host(host) for host in unknown))
+        return self.is_available()
+
+    async def aprobe(self) -> bool:
+        results = await asyncio.gather(*(self._aprobe_host(host) for host in self.hosts))
+        return any(results)
+
+    async def _aprobe_host(self, host: OllamaHost) -> bool:
+        try:
+            response = await self._get_async_client().get(f"{host.url}/api/tags", timeout=self.connect_timeout)
+            return host.record_tags(response)
+        except Exception as e:
+            logger.warning(f"Ollama not available at {host.url}: {e}")
+            host.mark(False)
+            return False
+
+    def _get_async_client(self) -> httpx.AsyncClient:
+        # httpx clients are bound to the event loop they were first used on
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_loop is not loop:
+            self._async_client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout),
+                limits=httpx.Limits(max_keepalive_connections=OLLAMA_POOL_SIZE * len(self.hosts)),
+            )
+            self._async_loop = loop
+        return self._async_client
+
+    async def aclose(self):
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+
+    def _payload(self, prompt: str, max_tokens: int, temperature: float) -> Dict[str, Any]:
+        return {
             "model": self.model,
             "prompt": prompt,
             "stream": False,
@@ -74,83 +670,45 @@ class OllamaClient:
                 "num_predict": max_tokens
             }
         }
-        
-        for attempt in range(self.max_retries + 1):
-            try:
-                start_time = time.time()
-                
-                response = requests.post(
-                    f"{self.host}/api/generate",
-                    json=payload,
-                    timeout=self.timeout
-                )
-                
-                end_time = time.time()
-                duration = end_time - start_time
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    generated_text = result.get("response", "").strip()
-                    
-                    if generated_text:
-                        tokens_per_sec = len(generated_text.split()) / duration if duration > 0 else 0
-                        logger.info(f"Ollama generation successful: {len(generated_text)} chars, {duration:.2f}s, ~{tokens_per_sec:.1f} tokens/sec")
-                        return generated_text
-                    else:
-                        logger.warning("Ollama returned empty response")
-                        return None
-                else:
-                    logger.error(f"Ollama API error: {response.status_code} - {response.text}")
-                    
-            except requests.exceptions.Timeout:
-                logger.error(f"Ollama timeout (attempt {attempt + 1}/{self.max_retries + 1})")
-                if attempt < self.max_retries:
-                    time.sleep(1)  # Brief delay before retry
-                    continue
-                else:
-                    logger.error("Ollama timeout after all retries")
-                    return None
-                    
-            except requests.exceptions.ConnectionError as e:
-                logger.error(f"Ollama connection error (attempt {attempt + 1}/{self.max_retries + 1}): {e}")
-                if attempt < self.max_retries:
-                    time.sleep(1)
-                    continue
-                else:
-                    logger.error("Ollama connection failed after all retries")
-                    return None
-                    
-            except Exception as e:
-                logger.error(f"Unexpected Ollama error: {e}")
-                return None
-        
-        return None
-    
+
+    def _generated_text(self, result: Dict[str, Any], duration: float) -> Optional[str]:
+        generated_text = result.get("response", "").strip()
+        if not generated_text:
+            logger.warning("Ollama returned empty response")
+            return None
+        tokens_per_sec = len(generated_text.split()) / duration if duration > 0 else 0
+        logger.info(f"Ollama generation successful: {len(generated_text)} chars, {duration:.2f}s, ~{tokens_per_sec:.1f} tokens/sec")
+        return generated_text
+
     def health_check(self) -> Dict[str, Any]:
         """
         Perform health check and return status information
-        
+
         Returns:
             Dictionary with health status, model info, and latency
         """
-        if not self.is_available():
+        if not self.probe():
             return {
-                "reachable": False,
+                "reachable": any(host.health_state == HEALTH_UP for host in self.hosts),
                 "model": self.model,
-                "error": "Ollama not accessible"
+                "hosts": [host.summary() for host in self.hosts],
+                "error": "Ollama not accessible" if all(host.health_state == HEALTH_DOWN for host in self.hosts)
+                else f"No Ollama host has model {self.model}"
             }
-        
+
         try:
             # Test with a simple prompt
             start_time = time.time()
-            result = self.generate("Say OK", max_tokens=10, temperature=0.1)
+            result = self.generate("Say OK", max_tokens=10, temperature=0.1, use_cache=False,
+                                   priority=PRIORITY_PROBE)
             end_time = time.time()
-            
+
             if result:
                 latency = end_time - start_time
                 return {
                     "reachable": True,
                     "model": self.model,
+                    "hosts": [host.summary() for host in self.hosts],
                     "latency_ms": round(latency * 1000, 2),
                     "status": "healthy"
                 }
@@ -158,26 +716,70 @@ class OllamaClient:
                 return {
                     "reachable": True,
                     "model": self.model,
+                    "hosts": [host.summary() for host in self.hosts],
                     "error": "Generation failed"
                 }
-                
+
         except Exception as e:
             return {
                 "reachable": True,
                 "model": self.model,
                 "error": f"Health check failed: {str(e)}"
             }
-    
+
     def get_model_info(self) -> Dict[str, Any]:
         """Get information about the current model"""
         models = self.get_available_models()
         return {
             "configured_model": self.model,
             "available_models": models,
-            "model_available": self.model in models,
+            "model_available": any(host.has_model() for host in self.hosts),
+            "hosts": [host.summary() for host in self.hosts],
             "recommended_model": "llama3.2:3b",
             "recommended_quant": "q4_K_M"
         }
 
+    def connection_stats(self) -> Dict[str, Any]:
+        """
+        Connection reuse per Ollama host
+
+        connections_opened well below requests means keep-alive is working;
+        the two growing together means sockets are being churned.
+        """
+        hosts = {}
+        for host in self.hosts:
+            pool = self._adapter.poolmanager.connection_from_url(host.url)
+            requests_made = pool.num_requests
+            hosts[host.url] = {
+                "connections_opened": pool.num_connections,
+                "requests": requests_made,
+                # Free slots in the pool queue hold None until a connection is returned
+                "idle_connections": sum(1 for conn in list(pool.pool.queue) if conn is not None) if pool.pool else 0,
+                "reuse_ratio": round(1 - pool.num_connections / requests_made, 4) if requests_made else 0.0
+            }
+        return {"pool_maxsize": OLLAMA_POOL_SIZE, "hosts": hosts}
+
+    def circuit_stats(self) -> Dict[str, Any]:
+        """Circuit breaker state and the adaptive timeout per host and generation length"""
+        return {
+            host.url: {**host.breaker.stats(), "latency": host.latency.stats(self.timeout)}
+            for host in self.hosts
+        }
+
+    def queue_stats(self) -> Dict[str, Any]:
+        """Admission queue depth and counters"""
+        return llm_admission.stats()
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """Response cache counters plus in-flight request coalescing"""
+        stats = {
+            "enabled": llm_cache is not None,
+            "in_flight": len(self._flights),
+            "coalesced": self.coalesced
+        }
+        if llm_cache is not None:
+            stats.update(llm_cache.stats())
+        return stats
+
 # Global instance
 ollama_client = OllamaClient()
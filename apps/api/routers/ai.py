@@ -3,10 +3,14 @@ AI Health and Status Endpoints
 """
 
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from typing import Dict, Any
+import json
+import time
 import logging
 
 from apps.api.ollama_client import ollama_client
+from apps.api.services.llm_admission import QueueFullError
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -27,6 +31,10 @@ def ai_health() -> Dict[str, Any]:
             "ai_service": "ollama",
             "health": health_info,
             "model_info": model_info,
+            "cache": ollama_client.cache_stats(),
+            "connections": ollama_client.connection_stats(),
+            "queue": ollama_client.queue_stats(),
+            "circuit": ollama_client.circuit_stats(),
             "recommendations": {
                 "model": "llama3.2:3b",
                 "quant": "q4_K_M",
@@ -70,7 +78,7 @@ def list_ai_models() -> Dict[str, Any]:
         raise HTTPException(status_code=500, detail=f"Failed to list models: {str(e)}")
 
 @router.post("/test")
-def test_ai_generation(prompt: str = "Hello, respond with just: OK") -> Dict[str, Any]:
+async def test_ai_generation(prompt: str = "Hello, respond with just: OK") -> Dict[str, Any]:
     """
     Test AI generation with a simple prompt
     
@@ -84,7 +92,7 @@ def test_ai_generation(prompt: str = "Hello, respond with just: OK") -> Dict[str
         import time
         start_time = time.time()
         
-        result = ollama_client.generate(prompt, max_tokens=50, temperature=0.1)
+        result = await ollama_client.agenerate(prompt, max_tokens=50, temperature=0.1)
         
         end_time = time.time()
         duration = end_time - start_time
@@ -105,6 +113,41 @@ def test_ai_generation(prompt: str = "Hello, respond with just: OK") -> Dict[str
                 "status": "failed"
             }
             
+    except QueueFullError:
+        raise
     except Exception as e:
         logger.error(f"AI test generation failed: {e}")
-        raise HTTPException(status_code=500, detail=f"Test failed: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Test failed: {str(e)}")
+
+@router.get("/test/stream")
+async def test_ai_generation_stream(prompt: str = "Hello, respond with just: OK", max_tokens: int = 50):
+    """
+    Server-Sent Events version of /test
+    
+    Streams a `token` event per generated fragment, then `done` with the
+    full result and timings (including time to first token).
+    """
+    async def events():
+        start_time = time.time()
+        first_token_ms = None
+        pieces = []
+        try:
+            async for fragment in ollama_client.astream_generate(prompt, max_tokens=max_tokens, temperature=0.1):
+                if first_token_ms is None:
+                    first_token_ms = round((time.time() - start_time) * 1000, 2)
+                pieces.append(fragment)
+                yield f"event: token\ndata: {json.dumps({'text': fragment})}\n\n"
+        except QueueFullError as e:
+            yield f"event: error\ndata: {json.dumps({'status': 429, 'detail': str(e)})}\n\n"
+            return
+        result = "".join(pieces).strip() or None
+        yield "event: done\ndata: " + json.dumps({
+            "ai_service": "ollama",
+            "result": result,
+            "first_token_ms": first_token_ms,
+            "duration_ms": round((time.time() - start_time) * 1000, 2),
+            "status": "success" if result else "failed"
+        }) + "\n\n"
+    
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
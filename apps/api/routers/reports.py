@@ -1,27 +1,48 @@
-import io, uuid, time, json
+import os, uuid, time, json, hashlib, tempfile, zipfile, asyncio, base64
 from datetime import datetime
-from typing import List
-from fastapi import APIRouter, UploadFile, File, HTTPException, Request
+from typing import List, Optional
+from fastapi import APIRouter, UploadFile, File, HTTPException, Request, Query
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
-import fitz  # PyMuPDF
-import pytesseract
-from PIL import Image
+from apps.api.services.pdf_extraction import extract_pdf_text_async, InvalidPDFError
+from apps.api.services.ingest_jobs import ingest_jobs
+from apps.api.services.report_registry import ReportRegistry, is_sort_key
+from apps.api.services.report_journal import ReportJournal
+from apps.api.services.text_store import text_store
+from apps.api.services.report_search import search_index, SearchUnavailableError
+from apps.api.services import report_db
+from apps.api.services.llm_admission import parse_priority
 
 router = APIRouter()
 
-# Load reports from JSON file on startup
-try:
-    with open("./apps/api/reports.json", "r", encoding="utf-8") as f:
-        REPORTS = json.load(f)
-        # Add created_at to existing reports that don't have it
-        for report in REPORTS:
-            if "created_at" not in report:
-                report["created_at"] = datetime.now().isoformat()
-        print(f"Loaded {len(REPORTS)} reports from JSON file")
-except FileNotFoundError:
-    REPORTS = []  # in-memory for dev
-    print("No reports.json file found, starting with empty list")
+# Report metadata is persisted to an append-only journal and replayed here
+_journal = ReportJournal()
+_journal_existed = _journal.exists()
+_loaded = _journal.replay()
+if not _journal_existed:
+    # First start on a journal: import the legacy reports.json snapshot
+    try:
+        with open("./apps/api/reports.json", "r", encoding="utf-8") as f:
+            _loaded = json.load(f)
+            # Add created_at to existing reports that don't have it
+            for report in _loaded:
+                if "created_at" not in report:
+                    report["created_at"] = datetime.now().isoformat()
+            print(f"Loaded {len(_loaded)} reports from JSON file")
+    except FileNotFoundError:
+        print("No reports.json file found, starting with empty list")
+else:
+    print(f"Loaded {len(_loaded)} reports from {_journal.path} ({_journal.entries} journal entries)")
+# Indexed by id, SHA-256 of the PDF bytes (upload dedup), filename and created_at
+REPORTS = ReportRegistry(_loaded, journal=_journal)
+if not _journal_existed and _loaded:
+    _journal.compact(REPORTS)
 MAX_BYTES = 10 * 1024 * 1024  # 10MB
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+UPLOAD_TMP_DIR = os.getenv("UPLOAD_TMP_DIR") or None
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", "250"))
+BATCH_MAX_ARCHIVE_BYTES = int(os.getenv("BATCH_MAX_ARCHIVE_BYTES", str(500 * 1024 * 1024)))
 
 class ReportOut(BaseModel):
     id: str
@@ -30,112 +51,629 @@ class ReportOut(BaseModel):
     text_len: int
     created_at: str
 
-@router.get("")
-def list_reports() -> List[ReportOut]:
-    return [ReportOut(**r) for r in REPORTS]
+REPORT_FIELDS = tuple(ReportOut.model_fields)
+# id -> (record, serialized JSON object) for the default field set; records
+# are never mutated in place, so the identity check is the invalidation
+_ROW_JSON = {}
 
-@router.post("/upload", response_model=ReportOut)
-async def upload_report(request: Request, file: UploadFile = File(...)):
-    if file.content_type not in ("application/pdf", "application/octet-stream", None):
-        raise HTTPException(415, "Unsupported file type: must be application/pdf")
+def _row_json(rec: dict) -> str:
+    cached = _ROW_JSON.get(rec["id"])
+    if cached is not None and cached[0] is rec:
+        return cached[1]
+    row = json.dumps({f: rec.get(f) for f in REPORT_FIELDS})
+    _ROW_JSON[rec["id"]] = (rec, row)
+    return row
 
-    content = await file.read()
-    if not content:
-        raise HTTPException(400, "Empty file")
-    if len(content) > MAX_BYTES:
-        raise HTTPException(413, "File too large (limit 10MB)")
+def _encode_cursor(sort: str, order: str, key: tuple) -> str:
+    raw = json.dumps([sort, order, list(key)]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
 
-    t0 = time.time()
+def _decode_cursor(cursor: str, sort: str, order: str) -> tuple:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        c_sort, c_order, key = json.loads(raw)
+    except Exception:
+        raise HTTPException(400, "Invalid cursor")
+    if (c_sort, c_order) != (sort, order):
+        raise HTTPException(400, "Cursor does not match sort/order")
+    if not is_sort_key(sort, key):
+        raise HTTPException(400, "Invalid cursor")
+    return tuple(key)
+
+@router.get("", response_model=List[ReportOut])
+def list_reports(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    offset: int = Query(0, ge=0),
+    sort: str = Query("created_at", pattern="^(created_at|filename)$"),
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    fields: Optional[str] = None,
+    filename: Optional[str] = None,
+):
+    """
+    List reports
+
+    Keyset pagination: pass `limit`, then follow the `cursor` returned in
+    the X-Next-Cursor header (also in a Link rel="next" header) until it is
+    absent. `fields` is a comma-separated subset of the report fields.
+    Rows come straight from the registry, serialized once and reused,
+    rather than being re-validated through ReportOut on every call.
+    """
+    after = _decode_cursor(cursor, sort, order) if cursor else None
+    descending = order == "desc"
+    if filename is not None:
+        recs = sorted(REPORTS.find_by_filename(filename), key=lambda r: REPORTS.sort_key(sort, r), reverse=descending)
+        if after is not None:
+            recs = [r for r in recs if (REPORTS.sort_key(sort, r) < after if descending else REPORTS.sort_key(sort, r) > after)]
+        recs = recs[offset:None if limit is None else offset + limit]
+    else:
+        recs = REPORTS.page(sort, descending, offset, limit, after)
+
+    if fields:
+        selected = [f.strip() for f in fields.split(",") if f.strip()]
+        unknown = [f for f in selected if f not in REPORT_FIELDS]
+        if unknown:
+            raise HTTPException(400, f"Unknown fields: {', '.join(unknown)}")
+        body = json.dumps([{f: r.get(f) for f in selected} for r in recs])
+    else:
+        body = "[" + ",".join(_row_json(r) for r in recs) + "]"
+
+    headers = {}
+    if limit is not None and len(recs) == limit:
+        next_cursor = _encode_cursor(sort, order, REPORTS.sort_key(sort, recs[-1]))
+        headers["X-Next-Cursor"] = next_cursor
+        next_url = request.url.remove_query_params(["cursor", "offset"]).include_query_params(cursor=next_cursor)
+        headers["Link"] = f'<{next_url}>; rel="next"'
+    return Response(content=body, media_type="application/json", headers=headers)
+
+async def _spool_upload(file: UploadFile) -> tuple:
+    """
+    Copy an upload to a temp file chunk by chunk, hashing as it goes
+
+    Enforces MAX_BYTES while reading so an oversized upload is rejected
+    without ever being held in memory. Returns (path, sha256); the caller
+    owns the file and must remove it.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    fd, path = tempfile.mkstemp(prefix="upload_", suffix=".pdf", dir=UPLOAD_TMP_DIR)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+                size += len(chunk)
+                if size > MAX_BYTES:
+                    raise HTTPException(413, "File too large (limit 10MB)")
+                digest.update(chunk)
+                out.write(chunk)
+        if size == 0:
+            raise HTTPException(400, "Empty file")
+    except BaseException:
+        os.remove(path)
+        raise
+    return path, digest.hexdigest()
+
+async def _persist_reports(recs: List[dict]):
+    """Write new reports to the credit_reports table in one bulk insert"""
     try:
-        doc = fitz.open(stream=content, filetype="pdf")
+        await run_in_threadpool(report_db.save_reports, recs)
     except Exception as e:
+        print(f"Failed to persist reports to database: {e}")
+
+def _write_text(report_id: str, result) -> List[int]:
+    """Store the extracted text; returns the page byte offsets"""
+    with text_store.open_write(report_id) as f:
+        return result.write_text(f)
+
+async def _ingest_report(path: str, sha256: str, filename: str, req_id: str = None, progress=None,
+                         persist: bool = True) -> dict:
+    """
+    Extract, store and register one spooled PDF; returns the report record
+
+    persist=False leaves the database insert to the caller, so batches can
+    write all their rows at once.
+    """
+    t0 = time.time()
+    existing = REPORTS.find_by_sha(sha256)
+    if existing and text_store.exists(existing["id"]):
+        print(json.dumps({
+            "event": "report_deduplicated",
+            "req_id": req_id,
+            "filename": filename,
+            "report_id": existing["id"],
+            "total_ms": int((time.time() - t0) * 1000),
+        }))
+        return existing
+
+    try:
+        result = await extract_pdf_text_async(path, progress=progress)
+    except InvalidPDFError as e:
         raise HTTPException(400, f"Invalid PDF file: {str(e)}")
-    
-    ocr_ms = 0
-    all_text = ""
-    for i in range(doc.page_count):
-        page = doc.load_page(i)
-        text = page.get_text("text") or ""
-        if text.strip():
-            all_text += text + "\n"
-        else:
-            # OCR fallback
-            try:
-                t_ocr = time.time()
-                pix = page.get_pixmap(dpi=200)
-                img = Image.open(io.BytesIO(pix.tobytes("png")))
-                ocr_text = pytesseract.image_to_string(img) or ""
-                ocr_ms += int((time.time() - t_ocr) * 1000)
-                all_text += ocr_text + "\n"
-            except Exception as e:
-                print(f"OCR failed for page {i}: {e}")
-                all_text += f"[OCR failed for page {i}]\n"
 
-    page_count = doc.page_count
-    doc.close()
+    page_count = result.page_count
+    text_len = result.text_len
 
     rid = str(uuid.uuid4())
+    page_offsets = None
     try:
-        with open(f"./report_{rid}.txt", "w", encoding="utf-8") as f:
-            f.write(all_text)
+        # Compression and fsync of a multi-MB text must not block the event loop
+        page_offsets = await run_in_threadpool(_write_text, rid, result)
     except Exception as e:
         print(f"Failed to save report text: {e}")
 
-    rec = {"id": rid, "filename": file.filename, "pages": page_count, "text_len": len(all_text), "created_at": datetime.now().isoformat()}
-    REPORTS.append(rec)
+    rec = {"id": rid, "filename": filename, "pages": page_count, "text_len": text_len, "created_at": datetime.now().isoformat(), "sha256": sha256, "page_offsets": page_offsets}
+    # Journal append (fsync) and any compaction happen off the event loop
+    await run_in_threadpool(REPORTS.add, rec)
+    if persist:
+        await _persist_reports([rec])
+
+    try:
+        await run_in_threadpool(search_index.index_pages, rid, [p.text for p in result.pages])
+    except Exception as e:
+        print(f"Failed to index report text: {e}")
 
     elapsed_ms = int((time.time() - t0) * 1000)
     # basic structured log (backend already adds req-log; this is record-level)
     print(json.dumps({
         "event": "report_uploaded",
-        "req_id": request.headers.get("X-Request-ID"),
-        "filename": file.filename,
+        "req_id": req_id,
+        "filename": filename,
         "pages": page_count,
-        "text_len": len(all_text),
-        "ocr_ms": ocr_ms,
+        "text_len": text_len,
+        "ocr_ms": result.ocr_ms,
+        "ocr_pages": sum(1 for p in result.pages if p.ocr and not p.cached),
+        "ocr_cached_pages": sum(1 for p in result.pages if p.cached),
+        "skipped_pages": sum(1 for p in result.pages if p.action == "skip"),
+        "ocr_dpi": [p.dpi for p in result.pages if p.dpi],
+        "page_ms": result.page_ms,
         "total_ms": elapsed_ms,
     }))
+    return rec
+
+@router.post("/upload", response_model=ReportOut)
+async def upload_report(request: Request, file: UploadFile = File(...), background: bool = False):
+    """
+    Upload a credit report PDF
+
+    With background=true the PDF is queued for ingestion and a 202 with a
+    job id is returned immediately; follow progress at /reports/jobs/{id}
+    or stream it from /reports/jobs/{id}/events.
+    """
+    if file.content_type not in ("application/pdf", "application/octet-stream", None):
+        raise HTTPException(415, "Unsupported file type: must be application/pdf")
+
+    path, sha256 = await _spool_upload(file)
+
+    req_id = request.headers.get("X-Request-ID")
+    if background:
+        async def work(job, progress):
+            try:
+                rec = await _ingest_report(path, sha256, file.filename, req_id, progress)
+            finally:
+                os.remove(path)
+            return rec["id"]
+
+        job = ingest_jobs.submit(file.filename, work)
+        return JSONResponse(status_code=202, content={
+            "job_id": job.id,
+            "status": job.status,
+            "status_url": f"/reports/jobs/{job.id}",
+            "events_url": f"/reports/jobs/{job.id}/events",
+        })
+
+    try:
+        rec = await _ingest_report(path, sha256, file.filename, req_id)
+    finally:
+        os.remove(path)
     return ReportOut(**rec)
 
+def _spool_zip_members(fileobj, archive_name: str, max_files: int = BATCH_MAX_FILES) -> list:
+    """
+    Copy every PDF in a ZIP archive to its own temp file
+
+    Members are streamed out in chunks with the same MAX_BYTES limit as
+    single uploads, so a compressed bomb is cut off rather than inflated.
+    Only the first max_files members are spooled. Returns one entry per
+    member: {"filename", "path", "sha256"} or {"filename", "error"}.
+    """
+    entries = []
+    try:
+        archive = zipfile.ZipFile(fileobj)
+    except zipfile.BadZipFile as e:
+        return [{"filename": archive_name, "error": f"Invalid ZIP file: {e}"}]
+
+    with archive:
+        members = [m for m in archive.infolist() if not m.is_dir() and not os.path.basename(m.filename).startswith(".")]
+        for member in members[:max_files]:
+            name = member.filename
+            if not name.lower().endswith(".pdf"):
+                entries.append({"filename": name, "error": "Unsupported file type: must be application/pdf"})
+                continue
+            digest = hashlib.sha256()
+            size = 0
+            fd, path = tempfile.mkstemp(prefix="upload_", suffix=".pdf", dir=UPLOAD_TMP_DIR)
+            try:
+                with os.fdopen(fd, "wb") as out, archive.open(member) as src:
+                    while chunk := src.read(UPLOAD_CHUNK_BYTES):
+                        size += len(chunk)
+                        if size > MAX_BYTES:
+                            raise ValueError("File too large (limit 10MB)")
+                        digest.update(chunk)
+                        out.write(chunk)
+                if size == 0:
+                    raise ValueError("Empty file")
+            except Exception as e:
+                os.remove(path)
+                entries.append({"filename": name, "error": str(e)})
+                continue
+            entries.append({"filename": name, "path": path, "sha256": digest.hexdigest()})
+        for member in members[max_files:]:
+            entries.append({"filename": member.filename, "error": f"Batch limit of {BATCH_MAX_FILES} files exceeded"})
+    return entries
+
+def _is_zip(file: UploadFile) -> bool:
+    return (file.content_type in ("application/zip", "application/x-zip-compressed")
+            or (file.filename or "").lower().endswith(".zip"))
+
+@router.post("/upload/batch")
+async def upload_report_batch(request: Request, files: List[UploadFile] = File(...)):
+    """
+    Upload many credit report PDFs at once, as individual files and/or ZIP archives
+
+    Every PDF goes through the same ingestion pipeline as /reports/upload,
+    concurrently (bounded by the extraction pools). A failing file does not
+    fail the batch; the response lists one manifest entry per PDF.
+    """
+    t0 = time.time()
+    req_id = request.headers.get("X-Request-ID")
+
+    entries = []
+    for file in files:
+        # Files past the limit still get a manifest entry, just not ingested
+        remaining = max(0, BATCH_MAX_FILES - len(entries))
+        if _is_zip(file):
+            if file.size and file.size > BATCH_MAX_ARCHIVE_BYTES:
+                entries.append({"filename": file.filename, "error": "Archive too large"})
+                continue
+            entries.extend(await run_in_threadpool(_spool_zip_members, file.file, file.filename, remaining))
+        elif not remaining:
+            entries.append({"filename": file.filename, "error": f"Batch limit of {BATCH_MAX_FILES} files exceeded"})
+        elif file.content_type not in ("application/pdf", "application/octet-stream", None):
+            entries.append({"filename": file.filename, "error": "Unsupported file type: must be application/pdf"})
+        else:
+            try:
+                path, sha256 = await _spool_upload(file)
+                entries.append({"filename": file.filename, "path": path, "sha256": sha256})
+            except HTTPException as e:
+                entries.append({"filename": file.filename, "error": e.detail})
+
+    # Identical PDFs inside one batch are extracted once and share the result
+    firsts = {}
+    for entry in entries:
+        if entry.get("sha256"):
+            firsts.setdefault(entry["sha256"], entry)
+
+    async def ingest(entry):
+        t_file = time.time()
+        entry["duplicate"] = REPORTS.find_by_sha(entry["sha256"]) is not None
+        try:
+            entry["record"] = await _ingest_report(entry["path"], entry["sha256"], entry["filename"], req_id,
+                                                   persist=False)
+        except HTTPException as e:
+            entry["error"] = e.detail
+        except Exception as e:
+            entry["error"] = str(e)
+        finally:
+            os.remove(entry["path"])
+        entry["elapsed_ms"] = int((time.time() - t_file) * 1000)
+
+    await asyncio.gather(*(ingest(entry) for entry in firsts.values()))
+    new_recs = [e["record"] for e in firsts.values() if e.get("record") and not e.get("duplicate")]
+    if new_recs:
+        await _persist_reports(new_recs)
+
+    manifest = []
+    for entry in entries:
+        first = firsts.get(entry.get("sha256"))
+        if first is not None and first is not entry:
+            if entry.get("path"):
+                os.remove(entry["path"])
+            entry = {**first, "filename": entry["filename"], "duplicate": True, "elapsed_ms": 0}
+        rec = entry.get("record")
+        manifest.append({
+            "filename": entry["filename"],
+            "status": "error" if rec is None else ("duplicate" if entry.get("duplicate") else "ok"),
+            "id": rec["id"] if rec else None,
+            "pages": rec["pages"] if rec else None,
+            "text_len": rec["text_len"] if rec else None,
+            "elapsed_ms": entry.get("elapsed_ms"),
+            "error": entry.get("error"),
+        })
+
+    total_ms = int((time.time() - t0) * 1000)
+    succeeded = sum(1 for m in manifest if m["status"] != "error")
+    print(json.dumps({
+        "event": "report_batch_uploaded",
+        "req_id": req_id,
+        "files": len(manifest),
+        "succeeded": succeeded,
+        "failed": len(manifest) - succeeded,
+        "total_ms": total_ms,
+    }))
+    return {
+        "count": len(manifest),
+        "succeeded": succeeded,
+        "failed": len(manifest) - succeeded,
+        "total_ms": total_ms,
+        "files": manifest,
+    }
+
+@router.get("/jobs/{job_id}")
+def get_ingest_job(job_id: str):
+    job = ingest_jobs.get(job_id)
+    if not job:
+        raise HTTPException(404, "Job not found")
+    return job.to_dict()
+
+@router.get("/jobs/{job_id}/events")
+async def stream_ingest_job(request: Request, job_id: str):
+    """Server-Sent Events stream of job progress, closed once the job finishes"""
+    job = ingest_jobs.get(job_id)
+    if not job:
+        raise HTTPException(404, "Job not found")
+
+    async def events():
+        version = -1
+        while True:
+            if await request.is_disconnected():
+                return
+            if job.version != version:
+                version = job.version
+                event = job.status if job.finished else "progress"
+                yield f"event: {event}\ndata: {json.dumps(job.to_dict())}\n\n"
+                if job.finished:
+                    return
+            elif not await ingest_jobs.wait_for_change(job_id, version, timeout=15):
+                # keep-alive comment so proxies don't drop an idle stream
+                yield ": ping\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def _load_pages(report_id: str) -> Optional[List[str]]:
+    """Stored text of a report split into pages (one page if it has no offset table)"""
+    report = REPORTS.get(report_id)
+    if report is None or not text_store.exists(report_id):
+        return None
+    offsets = report.get("page_offsets")
+    if not offsets:
+        return [text_store.read_text(report_id)]
+    with text_store.open_read(report_id) as f:
+        data = f.read()
+    return [data[a:b].decode("utf-8") for a, b in zip(offsets, offsets[1:])]
+
+def backfill_search_index():
+    """Index reports ingested before the search index existed (run at startup)"""
+    added = search_index.backfill([r["id"] for r in REPORTS], _load_pages)
+    if added:
+        print(f"Indexed {added} existing reports for search")
+
+@router.get("/search")
+def search_reports(
+    q: str = Query(..., min_length=1, max_length=500),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+):
+    """Full-text search across all report text; best-matching reports first, with a snippet and page"""
+    t0 = time.time()
+    try:
+        hits = search_index.search(q, limit, offset)
+    except SearchUnavailableError as e:
+        raise HTTPException(503, str(e))
+
+    results = []
+    for hit in hits:
+        report = REPORTS.get(hit["report_id"])
+        if report is None:
+            continue
+        results.append({**hit, "filename": report["filename"], "created_at": report["created_at"]})
+    return {"query": q, "results": results, "took_ms": int((time.time() - t0) * 1000)}
+
 @router.get("/{report_id}")
-def get_report(report_id: str):
-    report = next((r for r in REPORTS if r["id"] == report_id), None)
+def get_report(report_id: str, include_text: bool = True):
+    report = REPORTS.get(report_id)
     if not report:
         raise HTTPException(404, "Report not found")
     
+    text_content = None
+    if include_text:
+        try:
+            text_content = text_store.read_text(report_id)
+        except FileNotFoundError:
+            text_content = ""
+    
     try:
-        with open(f"./report_{report_id}.txt", "r", encoding="utf-8") as f:
-            text_content = f.read()
-    except FileNotFoundError:
-        text_content = ""
+        parsed_json = report_db.get_parsed(report_id)
+    except Exception as e:
+        print(f"Failed to load parsed report from database: {e}")
+        parsed_json = None
     
     return {
-        **report,
+        # Only the public fields; sha256 and page_offsets are internal
+        **{f: report.get(f) for f in REPORT_FIELDS},
         "text_content": text_content,
-        "parsed_json": None,  # Will be populated by AI analysis
-        "ai_service": "none"
+        "parsed_json": parsed_json,  # Populated by AI analysis
+        "ai_service": parsed_json.get("ai_service", "none") if parsed_json else "none"
     }
 
+TEXT_CHUNK_BYTES = 64 * 1024
+
+def _parse_range(header: str, size: int) -> Optional[tuple]:
+    """
+    Parse a single `bytes=` range into inclusive (start, end)
+
+    Returns None when the header should be ignored (multiple ranges, another
+    unit, or an invalid spec such as last < first, per RFC 7233); raises
+    416 when it is valid but cannot be satisfied.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, _, last = spec.strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+        else:
+            start, end = max(0, size - int(last)), size - 1
+    except ValueError:
+        return None
+    if first and last and start > end:
+        return None
+    if start >= size or end < start:  # past the end, or a zero-length suffix
+        raise HTTPException(416, "Requested range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+    return start, min(end, size - 1)
+
+def _iter_text(report_id: str, start: int, length: int):
+    with text_store.open_read(report_id) as f:
+        if start:
+            f.seek(start)
+        while length > 0:
+            chunk = f.read(min(TEXT_CHUNK_BYTES, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+def _text_stat(report_id: str) -> tuple:
+    """(record, stored file stat, uncompressed text size) or 404"""
+    report = REPORTS.get(report_id)
+    if not report:
+        raise HTTPException(404, "Report not found")
+    st = text_store.stat(report_id)
+    if st is None:
+        raise HTTPException(404, "Report text not found")
+    offsets = report.get("page_offsets")
+    size = offsets[-1] if offsets else text_store.text_size(report_id)
+    return report, st, size
+
+@router.get("/{report_id}/text")
+def get_report_text(request: Request, report_id: str):
+    """
+    Stream the extracted text as UTF-8 text/plain
+
+    Supports a single `Range: bytes=...` request (206) and conditional
+    requests via ETag / If-None-Match (304).
+    """
+    _, st, size = _text_stat(report_id)
+    etag = f'"{report_id}-{size}-{st.st_mtime_ns}"'
+    headers = {"ETag": etag, "Accept-Ranges": "bytes", "Cache-Control": "private, max-age=0, must-revalidate"}
+
+    if etag in [t.strip() for t in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+
+    byte_range = _parse_range(request.headers["range"], size) if request.headers.get("range") else None
+    if byte_range is None:
+        headers["Content-Length"] = str(size)
+        return StreamingResponse(_iter_text(report_id, 0, size), media_type="text/plain; charset=utf-8", headers=headers)
+
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(_iter_text(report_id, start, end - start + 1), status_code=206,
+                             media_type="text/plain; charset=utf-8", headers=headers)
+
+@router.get("/{report_id}/pages/{page}")
+def get_report_page(report_id: str, page: int):
+    """Text of one page (1-based), read directly from its offset in the text file"""
+    report, _, _ = _text_stat(report_id)
+    offsets = report.get("page_offsets")
+    if not offsets:
+        raise HTTPException(404, "Page index not available for this report")
+    if page < 1 or page >= len(offsets):
+        raise HTTPException(404, "Page not found")
+    start, end = offsets[page - 1], offsets[page]
+    with text_store.open_read(report_id) as f:
+        if start:
+            f.seek(start)
+        text = f.read(end - start).decode("utf-8")
+    return Response(content=text, media_type="text/plain; charset=utf-8",
+                    headers={"X-Page": str(page), "X-Page-Count": str(len(offsets) - 1)})
+
 @router.delete("/{report_id}")
 def delete_report(report_id: str):
-    global REPORTS
-    REPORTS = [r for r in REPORTS if r["id"] != report_id]
+    REPORTS.remove(report_id)
+    _ROW_JSON.pop(report_id, None)
+    text_store.delete(report_id)
+    search_index.remove(report_id)
     try:
-        import os; os.remove(f"./report_{report_id}.txt")
-    except FileNotFoundError:
-        pass
+        report_db.delete_report(report_id)
+    except Exception as e:
+        print(f"Failed to delete report from database: {e}")
     return {"deleted": True}
 
+async def _stored_analysis(report_id: str) -> Optional[dict]:
+    try:
+        stored = await run_in_threadpool(report_db.get_parsed, report_id)
+    except Exception as e:
+        print(f"Failed to load parsed report from database: {e}")
+        return None
+    # Failures stored before incomplete analyses were skipped are not hits
+    if not stored or stored.get("parsing_failed") or stored.get("chunks_failed"):
+        return None
+    return stored
+
+async def _record_analysis(request: Request, report_id: str, chars: int, analysis: dict, elapsed_ms: int):
+    """
+    Persist a fresh analysis and log it
+
+    Failed and partial analyses (some chunks failed) are not stored, so the
+    next /analyze tries again instead of serving them as cached; chunks that
+    did succeed come back from the LLM response cache.
+    """
+    if analysis.get("parsing_failed") or analysis.get("chunks_failed"):
+        print(f"Not persisting incomplete analysis for report {report_id}")
+    else:
+        try:
+            await run_in_threadpool(report_db.save_parsed, report_id, analysis, "Experian")
+        except Exception as e:
+            print(f"Failed to persist parsed report to database: {e}")
+
+    print(json.dumps({
+        "event": "report_analyzed",
+        "req_id": request.headers.get("X-Request-ID"),
+        "report_id": report_id,
+        "chars": chars,
+        "analysis_ms": elapsed_ms,
+        "ai_service": analysis.get("ai_service", "unknown")
+    }))
+
 @router.post("/analyze")
-async def analyze_report(request: Request, report_id: str):
-    """Analyze a report using AI"""
-    report = next((r for r in REPORTS if r["id"] == report_id), None)
+async def analyze_report(request: Request, report_id: str, force: bool = False,
+                         priority: str = Query("interactive", pattern="^(interactive|batch)$")):
+    """
+    Analyze a report using AI; the stored analysis is returned unless force=true
+
+    priority=batch queues behind interactive requests for the model. Answers
+    429 when the model's admission queue is full.
+    """
+    report = REPORTS.get(report_id)
     if not report:
         raise HTTPException(404, "Report not found")
     
+    if not force:
+        stored = await _stored_analysis(report_id)
+        if stored:
+            return {
+                "summary": stored,
+                "parsed_json": stored,
+                "chars": report.get("text_len", 0),
+                "ai_service": stored.get("ai_service", "unknown"),
+                "cached": True
+            }
+    
     try:
-        with open(f"./report_{report_id}.txt", "r", encoding="utf-8") as f:
-            text_content = f.read()
+        text_content = await run_in_threadpool(text_store.read_text, report_id)
     except FileNotFoundError:
         raise HTTPException(404, "Report text not found")
     
@@ -152,21 +690,59 @@ async def analyze_report(request: Request, report_id: str):
     analyzer = CreditReportAnalyzer()
     
     t0 = time.time()
-    analysis = analyzer.analyze_credit_report("Experian", None, text_content)
+    analysis = await analyzer.analyze_credit_report_async("Experian", text_content, use_cache=not force,
+                                                          priority=parse_priority(priority))
     elapsed_ms = int((time.time() - t0) * 1000)
-    
-    print(json.dumps({
-        "event": "report_analyzed",
-        "req_id": request.headers.get("X-Request-ID"),
-        "report_id": report_id,
-        "chars": len(text_content),
-        "analysis_ms": elapsed_ms,
-        "ai_service": analysis.get("ai_service", "unknown")
-    }))
+    await _record_analysis(request, report_id, len(text_content), analysis, elapsed_ms)
     
     return {
         "summary": analysis,
         "parsed_json": analysis,
         "chars": len(text_content),
-        "ai_service": analysis.get("ai_service", "unknown")
-    }
\ No newline at end of file
+        "ai_service": analysis.get("ai_service", "unknown"),
+        "cached": False
+    }
+
+@router.get("/analyze/stream")
+async def analyze_report_stream(request: Request, report_id: str, force: bool = False,
+                                priority: str = Query("interactive", pattern="^(interactive|batch)$")):
+    """
+    Server-Sent Events version of /analyze
+
+    Streams `token` events as the model generates, a `chunk` event with the
+    accounts found as each part of the report finishes, and a final `done`
+    event carrying the same body /analyze returns, or an `error` event if
+    the model's admission queue turned the request away.
+    """
+    report = REPORTS.get(report_id)
+    if not report:
+        raise HTTPException(404, "Report not found")
+    
+    stored = None if force else await _stored_analysis(report_id)
+    text_content = ""
+    if not stored:
+        try:
+            text_content = await run_in_threadpool(text_store.read_text, report_id)
+        except FileNotFoundError:
+            raise HTTPException(404, "Report text not found")
+    
+    async def events():
+        if stored:
+            body = {"summary": stored, "parsed_json": stored, "chars": report.get("text_len", 0),
+                    "ai_service": stored.get("ai_service", "unknown"), "cached": True}
+            yield f"event: done\ndata: {json.dumps(body)}\n\n"
+            return
+        
+        from apps.api.services.credit_analyzer import CreditReportAnalyzer
+        analyzer = CreditReportAnalyzer()
+        t0 = time.time()
+        async for event, data in analyzer.stream_credit_report_analysis("Experian", text_content, use_cache=not force,
+                                                                        priority=parse_priority(priority)):
+            if event == "done":
+                await _record_analysis(request, report_id, len(text_content), data, int((time.time() - t0) * 1000))
+                data = {"summary": data, "parsed_json": data, "chars": len(text_content),
+                        "ai_service": data.get("ai_service", "unknown"), "cached": False}
+            yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+    
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
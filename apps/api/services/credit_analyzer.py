@@ -5,11 +5,30 @@ Uses centralized Ollama client for AI analysis
 
 import os
 import json
-from typing import Dict, List, Optional
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 from datetime import datetime
 from .advanced_dispute_strategies import AdvancedDisputeStrategies
+from .report_chunker import split_report, merge_extractions
+from .llm_admission import QueueFullError, PRIORITY_INTERACTIVE
 from apps.api.ollama_client import ollama_client
 
+# Chunk prompts in flight at once: across all blocking analyses (the chunk
+# thread pool), and per analysis on the async paths, where the admission
+# queue (llm_admission) bounds the total and orders it by priority. The
+# window keeps one long report from filling OLLAMA_MAX_QUEUE by itself.
+LLM_MAX_CONCURRENT_CHUNKS = int(os.getenv("LLM_MAX_CONCURRENT_CHUNKS", "4"))
+
+_chunk_pool: Optional[ThreadPoolExecutor] = None
+
+def _get_chunk_pool() -> ThreadPoolExecutor:
+    global _chunk_pool
+    if _chunk_pool is None:
+        _chunk_pool = ThreadPoolExecutor(max_workers=LLM_MAX_CONCURRENT_CHUNKS, thread_name_prefix="llm-chunk")
+    return _chunk_pool
+
 class CreditReportAnalyzer:
     def __init__(self):
         self.advanced_strategies = AdvancedDisputeStrategies()
@@ -19,7 +38,8 @@ class CreditReportAnalyzer:
         print(f"  Ollama Model: {ollama_client.model}")
         print(f"  Ollama Timeout: {ollama_client.timeout}s")
         
-    def analyze_credit_report(self, bureau: str, pdf_content: Optional[bytes] = None, text_content: Optional[str] = None) -> Dict:
+    def analyze_credit_report(self, bureau: str, pdf_content: Optional[bytes] = None, text_content: Optional[str] = None,
+                              use_cache: bool = True) -> Dict:
         """
         Analyze credit report using LLM API to extract real creditor data
         
@@ -27,6 +47,7 @@ class CreditReportAnalyzer:
             bureau: Credit bureau (Experian, TransUnion, Equifax)
             pdf_content: Raw PDF content (if available)
             text_content: Extracted text content (if available)
+            use_cache: Reuse cached model responses; False forces fresh generations
         
         Returns:
             Structured credit report data with real creditor names
@@ -37,7 +58,7 @@ class CreditReportAnalyzer:
             print(f"Attempting AI extraction with text length: {len(text_content)}")
             try:
                 # Use AI to extract real creditor data from the PDF text
-                real_data = self._extract_real_credit_data(text_content, bureau)
+                real_data = self._extract_real_credit_data(text_content, bureau, use_cache)
                 if real_data:
                     print(f"AI extraction successful! Keys: {real_data.keys()}")
                     # Enhance with advanced dispute strategies
@@ -45,11 +66,115 @@ class CreditReportAnalyzer:
                     return enhanced_data
                 else:
                     print("AI extraction returned None")
+            except QueueFullError:
+                raise
+            except Exception as e:
+                print(f"AI extraction failed: {e}")
+                import traceback
+                traceback.print_exc()
+        
+        return self._failed_analysis(bureau)
+    
+    async def analyze_credit_report_async(self, bureau: str, text_content: Optional[str] = None,
+                                          use_cache: bool = True, priority: int = PRIORITY_INTERACTIVE) -> Dict:
+        """
+        analyze_credit_report() for async callers: generations run on the event loop
+        
+        Raises:
+            QueueFullError: The LLM admission queue rejected a chunk
+        """
+        if text_content and text_content.strip():
+            print(f"Attempting AI extraction with text length: {len(text_content)}")
+            try:
+                if await ollama_client.ais_available():
+                    print(f"Using {ollama_client.model} for AI analysis...")
+                    real_data = await self._aextract_with_ollama(text_content, bureau, use_cache, priority)
+                else:
+                    print(f"Ollama not available - no fallbacks enabled")
+                    real_data = None
+                if real_data:
+                    print(f"AI extraction successful! Keys: {real_data.keys()}")
+                    return self._enhance_with_advanced_strategies(real_data)
+                else:
+                    print("AI extraction returned None")
+            except QueueFullError:
+                raise
             except Exception as e:
                 print(f"AI extraction failed: {e}")
                 import traceback
                 traceback.print_exc()
         
+        return self._failed_analysis(bureau)
+    
+    async def stream_credit_report_analysis(self, bureau: str, text_content: Optional[str] = None,
+                                            use_cache: bool = True,
+                                            priority: int = PRIORITY_INTERACTIVE) -> AsyncIterator[Tuple[str, Dict]]:
+        """
+        Analyze a report while streaming progress, as (event, data) pairs
+        
+        Events:
+            token: {"part", "text"} - a generated fragment of one chunk
+            chunk: {"part", "parts", "ok", "accounts"} - a chunk finished and parsed
+            done: the full analysis, as analyze_credit_report() returns it
+            error: {"status": 429, "detail"} - the LLM queue turned every chunk away
+        """
+        if not text_content or not text_content.strip() or not await ollama_client.ais_available():
+            yield "done", self._failed_analysis(bureau)
+            return
+        
+        chunks = split_report(text_content)
+        parts = len(chunks)
+        outputs: List[Tuple[Optional[Dict], Optional[str]]] = [(None, None)] * parts
+        queue: asyncio.Queue = asyncio.Queue()
+        rejected: List[QueueFullError] = []
+        window = asyncio.Semaphore(LLM_MAX_CONCURRENT_CHUNKS)
+        
+        async def run(part: int, chunk: str):
+            pieces = []
+            try:
+                async with window:
+                    async for fragment in ollama_client.astream_generate(
+                            self._chunk_prompt(chunk, bureau, part, parts),
+                            max_tokens=1024, temperature=0.1, use_cache=use_cache, priority=priority):
+                        pieces.append(fragment)
+                        await queue.put(("token", {"part": part, "text": fragment}))
+            except QueueFullError as e:
+                rejected.append(e)
+            except Exception as e:
+                print(f"Ollama chunk {part}/{parts} failed: {e}")
+            outputs[part - 1] = self._parse_chunk_response("".join(pieces) or None, part, parts)
+            data = outputs[part - 1][0]
+            await queue.put(("chunk", {
+                "part": part,
+                "parts": parts,
+                "ok": data is not None,
+                "accounts": (data or {}).get("accounts", [])
+            }))
+        
+        t0 = time.time()
+        tasks = [asyncio.create_task(run(part, chunk)) for part, chunk in enumerate(chunks, start=1)]
+        try:
+            for _ in range(parts):
+                while True:
+                    event, data = await queue.get()
+                    yield event, data
+                    if event == "chunk":
+                        break
+        finally:
+            # The client went away mid-stream: stop generating for it
+            for task in tasks:
+                task.cancel()
+        
+        if rejected and all(data is None for data, _ in outputs):
+            yield "error", {"status": 429, "detail": str(rejected[0])}
+            return
+        real_data = self._merge_chunks(outputs, bureau, int((time.time() - t0) * 1000))
+        if real_data:
+            yield "done", self._enhance_with_advanced_strategies(real_data)
+        else:
+            yield "done", self._failed_analysis(bureau)
+    
+    def _failed_analysis(self, bureau: str) -> Dict:
         # No fallbacks - only AI analysis
         print(f"AI analysis failed - no fallbacks enabled")
         return {
@@ -64,15 +189,17 @@ class CreditReportAnalyzer:
             "parsing_failed": True
         }
     
-    def _extract_real_credit_data(self, text_content: str, bureau: str) -> Dict:
+    def _extract_real_credit_data(self, text_content: str, bureau: str, use_cache: bool = True) -> Dict:
         """Extract real credit data from PDF text using AI"""
         try:
             if ollama_client.is_available():
                 print(f"Using {ollama_client.model} for AI analysis...")
-                return self._extract_with_ollama(text_content, bureau)
+                return self._extract_with_ollama(text_content, bureau, use_cache)
             else:
                 print(f"Ollama not available - no fallbacks enabled")
                 return None
+        except QueueFullError:
+            raise
         except Exception as e:
             print(f"Real data extraction failed: {e}")
             return None
@@ -131,52 +258,154 @@ class CreditReportAnalyzer:
             print(f"Failed to enhance with advanced strategies: {e}")
             return credit_data
     
-    def _extract_with_ollama(self, text_content: str, bureau: str) -> Dict:
-        """Extract credit data using centralized Ollama client"""
+    def _extract_with_ollama(self, text_content: str, bureau: str, use_cache: bool = True) -> Dict:
+        """
+        Extract credit data from the whole report using centralized Ollama client
+
+        The text is split at account boundaries and the chunks are extracted
+        concurrently (up to LLM_MAX_CONCURRENT_CHUNKS at a time), so a long
+        report takes about as long as its slowest chunk. Per-chunk account
+        lists are merged and deduplicated into one result.
+        """
         try:
-            prompt = f"""Extract credit data from {bureau} report. Return JSON:
+            chunks = split_report(text_content)
+            if not chunks:
+                return None
+            t0 = time.time()
+            if len(chunks) == 1:
+                outputs = [self._extract_chunk(chunks[0], bureau, 1, 1, use_cache)]
+            else:
+                outputs = list(_get_chunk_pool().map(
+                    lambda args: self._extract_chunk(args[1], bureau, args[0], len(chunks), use_cache),
+                    enumerate(chunks, start=1),
+                ))
+            return self._merge_chunks(outputs, bureau, int((time.time() - t0) * 1000))
+
+        except QueueFullError:
+            raise
+        except Exception as e:
+            print(f"Ollama extraction failed: {e}")
+            return None
+
+    async def _aextract_with_ollama(self, text_content: str, bureau: str, use_cache: bool = True,
+                                    priority: int = PRIORITY_INTERACTIVE) -> Dict:
+        """
+        Async _extract_with_ollama(): chunks run as tasks on the event loop
+
+        A chunk turned away by the admission queue means the model is
+        overloaded, so the chunks still queued or generating are cancelled
+        rather than left holding slots. Like the streaming path, this only
+        raises QueueFullError when no chunk produced a result; otherwise the
+        partial extraction is returned.
+        """
+        try:
+            chunks = split_report(text_content)
+            if not chunks:
+                return None
+            t0 = time.time()
+            # Per-analysis window; waiting for the model happens in the admission queue
+            window = asyncio.Semaphore(LLM_MAX_CONCURRENT_CHUNKS)
+            tasks = [asyncio.ensure_future(self._aextract_chunk(chunk, bureau, part, len(chunks), window,
+                                                                use_cache, priority))
+                     for part, chunk in enumerate(chunks, start=1)]
+            try:
+                await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+            finally:
+                # Also runs if our caller is cancelled (the client went away)
+                for task in tasks:
+                    task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+            rejected = [task.exception() for task in tasks
+                        if not task.cancelled() and isinstance(task.exception(), QueueFullError)]
+            outputs = [task.result() if not task.cancelled() and task.exception() is None else (None, None)
+                       for task in tasks]
+            if rejected and all(data is None for data, _ in outputs):
+                raise rejected[0]
+            return self._merge_chunks(outputs, bureau, int((time.time() - t0) * 1000))
+
+        except QueueFullError:
+            raise
+        except Exception as e:
+            print(f"Ollama extraction failed: {e}")
+            return None
+
+    def _merge_chunks(self, outputs: List[Tuple[Optional[Dict], Optional[str]]], bureau: str,
+                      elapsed_ms: int) -> Optional[Dict]:
+        parsed = [data for data, _ in outputs]
+        failed = sum(1 for data in parsed if data is None)
+        print(f"Ollama extraction: {len(outputs)} chunks, {failed} failed, {elapsed_ms}ms")
+
+        credit_data = merge_extractions(parsed, bureau)
+        if credit_data is None:
+            raw = next((response for _, response in outputs if response), None)
+            if raw is None:
+                print("Ollama generation failed")
+                return None
+            return self._fallback_analysis({}, raw)
+
+        credit_data.setdefault("ai_service", "ollama")
+        credit_data["chunks"] = len(outputs)
+        credit_data["chunks_failed"] = failed
+        return credit_data
+
+    def _extract_chunk(self, chunk: str, bureau: str, part: int, parts: int,
+                       use_cache: bool = True) -> Tuple[Optional[Dict], Optional[str]]:
+        """Run the extraction prompt on one chunk; returns (parsed JSON or None, raw response)"""
+        try:
+            ai_response = ollama_client.generate(self._chunk_prompt(chunk, bureau, part, parts),
+                                                 max_tokens=1024, temperature=0.1, use_cache=use_cache)
+        except QueueFullError:
+            raise
+        except Exception as e:
+            print(f"Ollama chunk {part}/{parts} failed: {e}")
+            return None, None
+        return self._parse_chunk_response(ai_response, part, parts)
+
+    async def _aextract_chunk(self, chunk: str, bureau: str, part: int, parts: int, window: asyncio.Semaphore,
+                              use_cache: bool = True,
+                              priority: int = PRIORITY_INTERACTIVE) -> Tuple[Optional[Dict], Optional[str]]:
+        try:
+            async with window:
+                ai_response = await ollama_client.agenerate(self._chunk_prompt(chunk, bureau, part, parts),
+                                                            max_tokens=1024, temperature=0.1, use_cache=use_cache,
+                                                            priority=priority)
+        except QueueFullError:
+            raise
+        except Exception as e:
+            print(f"Ollama chunk {part}/{parts} failed: {e}")
+            return None, None
+        return self._parse_chunk_response(ai_response, part, parts)
+
+    def _chunk_prompt(self, chunk: str, bureau: str, part: int, parts: int) -> str:
+        return f"""Extract credit data from part {part} of {parts} of a {bureau} report. Return JSON:
 {{
     "bureau": "{bureau}",
-    "credit_score": [number or null],
-    "accounts": [{{"creditor_name": "name", "account_type": "type", "balance": 0, "payment_status": "status"}}],
+    "credit_score": [number or null if not in this part],
+    "accounts": [{{"creditor_name": "name", "account_number": "number", "account_type": "type", "balance": 0, "payment_status": "status"}}],
     "dispute_opportunities": [{{"account_name": "name", "reason_code": "FACTUAL", "reason_description": "reason", "confidence_score": 0.8}}]
 }}
+List every account in this part and no others.
 
-Text: {text_content[:2000]}
+Text: {chunk}
 """
 
-            ai_response = ollama_client.generate(prompt, max_tokens=1024, temperature=0.1)
-            
-            if ai_response:
-                try:
-                    # Try to extract JSON from the response
-                    json_start = ai_response.find('{')
-                    json_end = ai_response.rfind('}') + 1
-                    
-                    if json_start >= 0 and json_end > json_start:
-                        json_str = ai_response[json_start:json_end]
-                        credit_data = json.loads(json_str)
-                        
-                        # Ensure required fields exist
-                        credit_data.setdefault("bureau", bureau)
-                        credit_data.setdefault("accounts", [])
-                        credit_data.setdefault("dispute_opportunities", [])
-                        credit_data.setdefault("ai_service", "ollama")
-                        
-                        return credit_data
-                    else:
-                        print("WARNING: No JSON found in Ollama response")
-                        return self._fallback_analysis({}, ai_response)
-                except json.JSONDecodeError as e:
-                    print(f"WARNING: JSON parsing failed: {e}")
-                    return self._fallback_analysis({}, ai_response)
-            else:
-                print("Ollama generation failed")
-                return None
-                
-        except Exception as e:
-            print(f"Ollama extraction failed: {e}")
-            return None
+    def _parse_chunk_response(self, ai_response: Optional[str], part: int,
+                              parts: int) -> Tuple[Optional[Dict], Optional[str]]:
+        if not ai_response:
+            return None, None
+
+        # Try to extract JSON from the response
+        json_start = ai_response.find('{')
+        json_end = ai_response.rfind('}') + 1
+        if json_start < 0 or json_end <= json_start:
+            print(f"WARNING: No JSON found in Ollama response for chunk {part}/{parts}")
+            return None, ai_response
+        try:
+            return json.loads(ai_response[json_start:json_end]), ai_response
+        except json.JSONDecodeError as e:
+            print(f"WARNING: JSON parsing failed for chunk {part}/{parts}: {e}")
+            return None, ai_response
     
     def _extract_with_regex(self, text_content: str, bureau: str) -> Dict:
         """Extract REAL credit data using regex patterns from actual PDF text"""
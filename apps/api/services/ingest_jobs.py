@@ -0,0 +1,128 @@
+"""
+Report Ingestion Jobs
+Tracks background PDF ingestion and publishes progress to waiting clients
+"""
+
+import os
+import uuid
+import asyncio
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass, field, asdict
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Finished jobs kept around for status lookups before the oldest are dropped
+INGEST_JOB_HISTORY = int(os.getenv("INGEST_JOB_HISTORY", "500"))
+
+@dataclass
+class IngestJob:
+    id: str
+    filename: Optional[str]
+    status: str = "queued"  # queued | running | done | failed
+    pages_done: int = 0
+    pages_total: int = 0
+    ocr_ms: int = 0
+    report_id: Optional[str] = None
+    error: Optional[str] = None
+    created_at: str = field(default_factory=lambda: datetime.now().isoformat())
+    finished_at: Optional[str] = None
+    version: int = 0
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+class IngestJobManager:
+    """In-process registry of ingestion jobs and their progress"""
+
+    def __init__(self, history: int = INGEST_JOB_HISTORY):
+        self.history = history
+        self._jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+        self._changed: Dict[str, asyncio.Event] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        return self._jobs.get(job_id)
+
+    def submit(self, filename: Optional[str], work: Callable[["IngestJob", Callable], Awaitable[str]]) -> IngestJob:
+        """
+        Start a job on the running event loop
+
+        Args:
+            filename: Original upload name, for display
+            work: Coroutine factory taking the job and a thread-safe
+                progress(pages_done, pages_total, ocr_ms) callback and
+                returning the new report id
+
+        Returns:
+            The queued job
+        """
+        job = IngestJob(id=str(uuid.uuid4()), filename=filename)
+        self._jobs[job.id] = job
+        self._changed[job.id] = asyncio.Event()
+        self._trim()
+
+        loop = asyncio.get_running_loop()
+
+        def progress(done: int, total: int, ocr_ms: int):
+            loop.call_soon_threadsafe(self._update, job.id, {
+                "status": "running", "pages_done": done, "pages_total": total, "ocr_ms": ocr_ms,
+            })
+
+        async def run():
+            self._update(job.id, {"status": "running"})
+            try:
+                report_id = await work(job, progress)
+                self._update(job.id, {"status": "done", "report_id": report_id,
+                                      "finished_at": datetime.now().isoformat()})
+            except Exception as e:
+                logger.error(f"Ingestion job {job.id} failed: {e}")
+                self._update(job.id, {"status": "failed", "error": getattr(e, "detail", None) or str(e),
+                                      "finished_at": datetime.now().isoformat()})
+            finally:
+                self._tasks.pop(job.id, None)
+
+        self._tasks[job.id] = asyncio.create_task(run())
+        return job
+
+    async def wait_for_change(self, job_id: str, version: int, timeout: float) -> bool:
+        """Wait until the job moves past `version`; False on timeout"""
+        job = self._jobs.get(job_id)
+        event = self._changed.get(job_id)
+        if job is None or event is None:
+            return False
+        if job.version != version:
+            return True
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def _update(self, job_id: str, fields: Dict[str, Any]):
+        job = self._jobs.get(job_id)
+        if job is None:
+            return
+        for key, value in fields.items():
+            setattr(job, key, value)
+        job.version += 1
+        # Wake current waiters, then re-arm for the next change
+        event = self._changed.get(job_id)
+        if event is not None:
+            event.set()
+            self._changed[job_id] = asyncio.Event()
+
+    def _trim(self):
+        finished = [j.id for j in self._jobs.values() if j.finished]
+        for job_id in finished[:max(0, len(self._jobs) - self.history)]:
+            self._jobs.pop(job_id, None)
+            self._changed.pop(job_id, None)
+
+# Global instance
+ingest_jobs = IngestJobManager()
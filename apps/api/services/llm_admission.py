@@ -0,0 +1,201 @@
+"""
+LLM Admission Control
+Bounded, priority-ordered queue in front of the model server
+"""
+
+import os
+import time
+import heapq
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Generations each model server runs at once; match OLLAMA_NUM_PARALLEL.
+# The client scales this by the number of OLLAMA_HOSTS
+OLLAMA_MAX_CONCURRENT = int(os.getenv("OLLAMA_MAX_CONCURRENT", "2"))
+# Requests allowed to wait for a slot; beyond this they are rejected at once
+OLLAMA_MAX_QUEUE = int(os.getenv("OLLAMA_MAX_QUEUE", "16"))
+# Longest a request waits for a slot before giving up
+OLLAMA_QUEUE_TIMEOUT_SECONDS = float(os.getenv("OLLAMA_QUEUE_TIMEOUT_SECONDS", "60"))
+
+# Lower runs first. Health probes are a few tokens and must not sit behind
+# minutes of analyses; batch re-analysis yields to people waiting on a page.
+PRIORITY_PROBE = 0
+PRIORITY_INTERACTIVE = 1
+PRIORITY_BATCH = 2
+PRIORITY_NAMES = {PRIORITY_PROBE: "probe", PRIORITY_INTERACTIVE: "interactive", PRIORITY_BATCH: "batch"}
+
+class QueueFullError(RuntimeError):
+    """Raised when a request cannot be admitted; maps to HTTP 429"""
+
+    def __init__(self, message: str, retry_after: int = 5):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class _Waiter:
+    """A queued request; `granted` and `abandoned` only change under the controller lock"""
+
+    __slots__ = ("fut", "granted", "abandoned")
+
+    def __init__(self):
+        self.fut: Future = Future()
+        self.granted = False
+        self.abandoned = False
+
+class AdmissionController:
+    """
+    At most `max_concurrent` holders of a slot, the rest queued by priority
+
+    Waiters sit in a heap ordered by (priority, arrival) and are woken
+    through a concurrent.futures.Future, so the same queue serves threads
+    (which block on the future) and coroutines (which await it via
+    asyncio.wrap_future). A released slot is handed straight to the next
+    live waiter. Whether a waiter got the slot or gave up is decided under
+    the lock, never from the future's state, so a slot handed over just as
+    its waiter times out is passed on rather than leaked.
+    """
+
+    def __init__(self, max_concurrent: int = OLLAMA_MAX_CONCURRENT, max_queue: int = OLLAMA_MAX_QUEUE,
+                 queue_timeout: float = OLLAMA_QUEUE_TIMEOUT_SECONDS):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.wait_ms_total = 0.0
+        self.wait_ms_max = 0.0
+        self._heap: List[Tuple[int, int, _Waiter]] = []
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def _enqueue(self, priority: int) -> _Waiter:
+        waiter = _Waiter()
+        with self._lock:
+            if self.active < self.max_concurrent and not self._heap:
+                self.active += 1
+                waiter.granted = True
+                waiter.fut.set_result(None)
+                return waiter
+            if len(self._heap) >= self.max_queue:
+                self.rejected += 1
+                raise QueueFullError(f"LLM queue is full ({len(self._heap)} waiting)")
+            self._seq += 1
+            heapq.heappush(self._heap, (priority, self._seq, waiter))
+        return waiter
+
+    def set_capacity(self, max_concurrent: int):
+        """
+        Change the number of slots
+
+        Added slots go to waiters at once; when shrinking, slots are
+        retired as their holders release them.
+        """
+        with self._lock:
+            self.max_concurrent = max_concurrent
+            while self.active < self.max_concurrent and self._heap:
+                _, _, waiter = heapq.heappop(self._heap)
+                if not waiter.abandoned:
+                    self.active += 1
+                    waiter.granted = True
+                    waiter.fut.set_result(None)
+
+    def release(self):
+        with self._lock:
+            while self.active <= self.max_concurrent and self._heap:
+                _, _, waiter = heapq.heappop(self._heap)
+                if not waiter.abandoned:
+                    waiter.granted = True
+                    waiter.fut.set_result(None)
+                    return
+            self.active -= 1
+
+    def _admitted(self, started: float):
+        wait_ms = (time.time() - started) * 1000
+        with self._lock:
+            self.admitted += 1
+            self.wait_ms_total += wait_ms
+            self.wait_ms_max = max(self.wait_ms_max, wait_ms)
+
+    def _gave_up(self, waiter: _Waiter):
+        with self._lock:
+            if not waiter.granted:
+                waiter.abandoned = True
+                self._heap = [entry for entry in self._heap if entry[2] is not waiter]
+                heapq.heapify(self._heap)
+                return
+        # The slot was handed over while we were giving up: pass it on
+        self.release()
+
+    @contextmanager
+    def slot(self, priority: int = PRIORITY_INTERACTIVE):
+        """Hold a slot for the duration of a blocking call"""
+        started = time.time()
+        waiter = self._enqueue(priority)
+        try:
+            waiter.fut.result(timeout=self.queue_timeout)
+        except FutureTimeoutError:
+            self._gave_up(waiter)
+            with self._lock:
+                self.timed_out += 1
+            raise QueueFullError(f"Timed out after {self.queue_timeout:.0f}s waiting for the LLM")
+        self._admitted(started)
+        try:
+            yield
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def aslot(self, priority: int = PRIORITY_INTERACTIVE):
+        """Hold a slot for the duration of an awaited call"""
+        started = time.time()
+        waiter = self._enqueue(priority)
+        try:
+            await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(waiter.fut)), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._gave_up(waiter)
+            with self._lock:
+                self.timed_out += 1
+            raise QueueFullError(f"Timed out after {self.queue_timeout:.0f}s waiting for the LLM")
+        except asyncio.CancelledError:
+            self._gave_up(waiter)
+            raise
+        self._admitted(started)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            queued = {name: 0 for name in PRIORITY_NAMES.values()}
+            for priority, _, waiter in self._heap:
+                if not waiter.abandoned:
+                    queued[PRIORITY_NAMES.get(priority, str(priority))] += 1
+            return {
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "active": self.active,
+                "queued": sum(queued.values()),
+                "queued_by_priority": queued,
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+                "avg_wait_ms": round(self.wait_ms_total / self.admitted, 2) if self.admitted else 0.0,
+                "max_wait_ms": round(self.wait_ms_max, 2),
+            }
+
+def parse_priority(name: str) -> int:
+    for priority, label in PRIORITY_NAMES.items():
+        if label == name:
+            return priority
+    raise ValueError(f"Unknown priority: {name}")
+
+# Global instance
+llm_admission = AdmissionController()
@@ -0,0 +1,152 @@
+"""
+LLM Response Cache
+SQLite-backed cache of generated text keyed by model, options and prompt
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "./apps/api/llm_cache.db")
+# Total size of cached responses; least recently used entries go first
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+# 0 keeps entries until they are evicted for space
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+# Last-access times are only rewritten when older than this, so a hot entry
+# does not cost a write on every hit
+_TOUCH_INTERVAL = 60
+
+def cache_key(model: str, options: Dict[str, Any], prompt: str) -> str:
+    payload = json.dumps({"model": model, "options": options, "prompt": prompt}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class LLMResponseCache:
+    """
+    Generated text by cache_key(model, options, prompt)
+
+    Entries expire after `ttl` seconds and the least recently used are
+    evicted once the stored responses exceed `max_bytes`. The running
+    total is kept in memory so puts do not have to sum the table.
+    """
+
+    def __init__(self, path: str = LLM_CACHE_PATH, max_bytes: int = LLM_CACHE_MAX_BYTES,
+                 ttl: int = LLM_CACHE_TTL_SECONDS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, model TEXT, response TEXT, size INTEGER, "
+            "created_at REAL, accessed_at REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_llm_cache_accessed_at ON llm_cache (accessed_at)")
+        self._conn.commit()
+        self._bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, size, created_at, accessed_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            response, size, created_at, accessed_at = row
+            if self.ttl and now - created_at > self.ttl:
+                with self._conn:
+                    self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._bytes -= size
+                self.expired += 1
+                self.misses += 1
+                return None
+            if now - accessed_at > _TOUCH_INTERVAL:
+                with self._conn:
+                    self._conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return response
+
+    def put(self, key: str, model: str, response: str):
+        size = len(response.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock, self._conn:
+            old = self._conn.execute("SELECT size FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, model, response, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, response, size, now, now),
+            )
+            self._bytes += size - (old[0] if old else 0)
+            if self._bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        # Expired entries first, then oldest access until under the limit
+        if self.ttl:
+            cutoff = time.time() - self.ttl
+            count, freed = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache WHERE created_at < ?", (cutoff,)
+            ).fetchone()
+            self._conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (cutoff,))
+            self._bytes -= freed
+            self.expired += count
+        while self._bytes > self.max_bytes:
+            victims = self._conn.execute(
+                "SELECT key, size FROM llm_cache ORDER BY accessed_at LIMIT 64"
+            ).fetchall()
+            if not victims:
+                self._bytes = 0
+                break
+            for key, size in victims:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._bytes -= size
+                self.evictions += 1
+                if self._bytes <= self.max_bytes:
+                    break
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM llm_cache")
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "entries": entries,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "expired": self.expired,
+                "evictions": self.evictions,
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+# Global instance
+llm_cache = LLMResponseCache() if LLM_CACHE_ENABLED else None
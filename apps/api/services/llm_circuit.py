@@ -0,0 +1,165 @@
+"""
+LLM Circuit Breaker
+Fails fast while the model server is down and sizes request timeouts from
+observed latency
+"""
+
+import os
+import time
+import math
+import logging
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Consecutive failed calls that open the circuit
+OLLAMA_BREAKER_FAILURES = int(os.getenv("OLLAMA_BREAKER_FAILURES", "3"))
+# How long an open circuit rejects calls before letting one trial through
+OLLAMA_BREAKER_COOLDOWN_SECONDS = float(os.getenv("OLLAMA_BREAKER_COOLDOWN_SECONDS", "30"))
+
+# Adaptive timeout: LATENCY_PERCENTILE of recent generations of the same
+# length, times LATENCY_TIMEOUT_FACTOR, clamped to [MIN, MAX]
+OLLAMA_TIMEOUT_MIN_SECONDS = float(os.getenv("OLLAMA_TIMEOUT_MIN_SECONDS", "5"))
+OLLAMA_TIMEOUT_MAX_SECONDS = float(os.getenv("OLLAMA_TIMEOUT_MAX_SECONDS", "120"))
+OLLAMA_LATENCY_PERCENTILE = float(os.getenv("OLLAMA_LATENCY_PERCENTILE", "99"))
+OLLAMA_LATENCY_TIMEOUT_FACTOR = float(os.getenv("OLLAMA_LATENCY_TIMEOUT_FACTOR", "2.0"))
+# Samples needed before the observed latency replaces the fixed timeout
+OLLAMA_LATENCY_MIN_SAMPLES = int(os.getenv("OLLAMA_LATENCY_MIN_SAMPLES", "20"))
+_WINDOW = 200
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitBreaker:
+    """
+    closed -> open after `threshold` consecutive failures; open rejects
+    every call for `cooldown` seconds, then half-open admits exactly one
+    trial call: success closes the circuit, failure re-opens it.
+    """
+
+    def __init__(self, threshold: int = OLLAMA_BREAKER_FAILURES, cooldown: float = OLLAMA_BREAKER_COOLDOWN_SECONDS):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_started = 0.0
+        self.rejected = 0
+        self.times_opened = 0
+        self._lock = threading.Lock()
+
+    def blocked(self) -> bool:
+        """Whether a call would be rejected right now (does not take the trial)"""
+        with self._lock:
+            return self._blocked(time.time())
+
+    def _blocked(self, now: float) -> bool:
+        if self.state == OPEN:
+            return now - self.opened_at < self.cooldown
+        if self.state == HALF_OPEN:
+            # A trial that never reported back must not wedge the circuit
+            return now - self.trial_started < self.cooldown
+        return False
+
+    def allow(self) -> bool:
+        """Permission for one call; in half-open only the trial call gets it"""
+        with self._lock:
+            now = time.time()
+            if self._blocked(now):
+                self.rejected += 1
+                return False
+            if self.state != CLOSED:
+                self.state = HALF_OPEN
+                self.trial_started = now
+                logger.info("Ollama circuit half-open: sending a trial request")
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self.state != CLOSED:
+                logger.info("Ollama circuit closed")
+            self.state = CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.threshold):
+                if self.state == CLOSED:
+                    self.times_opened += 1
+                self.state = OPEN
+                self.opened_at = time.time()
+                logger.warning(f"Ollama circuit open for {self.cooldown:.0f}s after {self.failures} failures")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.failures,
+                "threshold": self.threshold,
+                "cooldown_seconds": self.cooldown,
+                "retry_in_seconds": round(max(0.0, self.cooldown - (time.time() - self.opened_at)), 1)
+                if self.state == OPEN else 0.0,
+                "times_opened": self.times_opened,
+                "rejected": self.rejected,
+            }
+
+class LatencyTracker:
+    """
+    Recent successful generation latencies, bucketed by requested length
+
+    A 10-token health probe and a 1024-token extraction differ by orders of
+    magnitude, so each num_predict value gets its own window.
+    """
+
+    def __init__(self, window: int = _WINDOW):
+        self.window = window
+        self._samples: Dict[int, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, max_tokens: int, seconds: float):
+        with self._lock:
+            self._samples.setdefault(max_tokens, deque(maxlen=self.window)).append(seconds)
+
+    def observe_timeout(self, max_tokens: int, timeout: float):
+        """
+        Record a call that hit its timeout, at the timeout value
+
+        Successes alone all finish inside the current timeout, so the
+        estimate could never rise after a cold model load or on a slower
+        host. The timeout is a lower bound on the real latency; as a sample
+        it lifts the percentile and the next attempt gets more time.
+        """
+        self.observe(max_tokens, timeout)
+
+    def percentile(self, max_tokens: int, pct: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples.get(max_tokens, ()))
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, max(0, math.ceil(pct / 100 * len(samples)) - 1))]
+
+    def timeout(self, max_tokens: int, default: float) -> float:
+        """Read timeout for a generation of max_tokens; `default` until enough samples"""
+        with self._lock:
+            count = len(self._samples.get(max_tokens, ()))
+        if count < OLLAMA_LATENCY_MIN_SAMPLES:
+            return default
+        observed = self.percentile(max_tokens, OLLAMA_LATENCY_PERCENTILE) * OLLAMA_LATENCY_TIMEOUT_FACTOR
+        return min(OLLAMA_TIMEOUT_MAX_SECONDS, max(OLLAMA_TIMEOUT_MIN_SECONDS, observed))
+
+    def stats(self, default: float) -> Dict[str, Any]:
+        with self._lock:
+            buckets = sorted(self._samples)
+        return {
+            str(max_tokens): {
+                "samples": len(self._samples[max_tokens]),
+                "p50_ms": round(self.percentile(max_tokens, 50) * 1000, 1),
+                "p99_ms": round(self.percentile(max_tokens, 99) * 1000, 1),
+                "timeout_seconds": round(self.timeout(max_tokens, default), 2),
+            }
+            for max_tokens in buckets
+        }
@@ -0,0 +1,72 @@
+"""
+OCR Page Cache
+Content-addressed cache of OCR output so re-uploaded pages are not re-OCR'd
+"""
+
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+PAGE_CACHE_MAX_CHARS = int(os.getenv("PAGE_CACHE_MAX_CHARS", str(64 * 1024 * 1024)))
+
+def page_fingerprint(doc, page) -> str:
+    """
+    Hash everything that determines what a page renders to
+
+    Covers the page geometry, its content stream and the raw (undecoded)
+    streams of every image, font and form XObject it references, so two
+    pages only collide when they would OCR to the same text.
+    """
+    h = hashlib.sha256()
+    h.update(f"{tuple(page.rect)}:{page.rotation}".encode())
+    h.update(page.read_contents() or b"")
+    xrefs = [img[0] for img in page.get_images(full=True)]
+    xrefs += [font[0] for font in page.get_fonts(full=True)]
+    xrefs += [xobj[0] for xobj in page.get_xobjects()]
+    for xref in xrefs:
+        if xref > 0:
+            h.update(doc.xref_stream_raw(xref) or b"")
+    return h.hexdigest()
+
+class PageTextCache:
+    """Thread-safe LRU of page fingerprint -> OCR text, bounded by total characters"""
+
+    def __init__(self, max_chars: int = PAGE_CACHE_MAX_CHARS):
+        self.max_chars = max_chars
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._chars = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            text = self._entries.get(key)
+            if text is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return text
+
+    def put(self, key: str, text: str):
+        if len(text) > self.max_chars:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._chars -= len(old)
+            self._entries[key] = text
+            self._chars += len(text)
+            while self._chars > self.max_chars:
+                _, evicted = self._entries.popitem(last=False)
+                self._chars -= len(evicted)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "chars": self._chars, "hits": self.hits, "misses": self.misses}
+
+# Global instance
+page_cache = PageTextCache()
@@ -0,0 +1,124 @@
+"""
+Page Classifier
+Decides per PDF page whether to trust the text layer, OCR it (and at what
+resolution), or skip it entirely
+"""
+
+import os
+import unicodedata
+from dataclasses import dataclass
+from statistics import median
+from typing import Optional
+
+import fitz  # PyMuPDF
+
+# Text layers scoring below this are treated as garbage and OCR'd instead
+OCR_TEXT_SCORE_MIN = float(os.getenv("OCR_TEXT_SCORE_MIN", "0.5"))
+# A page mostly covered by an image with only a few characters of text
+# (typically a scan with a printed header/footer) is OCR'd as well
+OCR_SPARSE_TEXT_CHARS = int(os.getenv("OCR_SPARSE_TEXT_CHARS", "80"))
+# Images covering less of the page than this are logos/rules, not scans
+OCR_MIN_IMAGE_COVERAGE = float(os.getenv("OCR_MIN_IMAGE_COVERAGE", "0.05"))
+# Vector-only pages with this many paths are likely text converted to
+# outlines and are still worth OCR'ing
+OCR_OUTLINED_TEXT_PATHS = int(os.getenv("OCR_OUTLINED_TEXT_PATHS", "300"))
+OCR_MIN_DPI = int(os.getenv("OCR_MIN_DPI", "150"))
+OCR_MAX_DPI = int(os.getenv("OCR_MAX_DPI", "400"))
+OCR_DEFAULT_DPI = int(os.getenv("OCR_DEFAULT_DPI", "200"))
+# Tesseract is most accurate with body text around 30px per em
+OCR_TARGET_EM_PX = 30
+
+_PUNCT = set(".,:;!?$%&#@*/()[]{}'\"-+=<>|_~")
+_VOWELS = set("aeiouyAEIOUY")
+_BAD_CATEGORIES = ("Cc", "Co", "Cs", "Cn")
+
+@dataclass
+class PageClass:
+    action: str  # text | ocr | skip
+    dpi: Optional[int] = None
+    text_score: float = 0.0
+    reason: str = ""
+
+def _wordlike(token: str) -> bool:
+    alnum = sum(1 for c in token if c.isalnum())
+    if alnum == 0 or alnum * 2 < len(token):
+        return False
+    letters = [c for c in token if c.isalpha()]
+    # Long all-letter runs without a vowel are what broken font maps produce
+    if len(letters) == len(token) and len(token) > 3 and not any(c in _VOWELS for c in token):
+        return False
+    return True
+
+def text_layer_score(text: str) -> float:
+    """Score 0..1 for how much a native text layer looks like readable text"""
+    chars = [c for c in text if not c.isspace()]
+    if not chars:
+        return 0.0
+    bad = sum(1 for c in chars if c == "\ufffd" or unicodedata.category(c) in _BAD_CATEGORIES)
+    readable = sum(1 for c in chars if c.isalnum() or c in _PUNCT)
+    tokens = text.split()
+    wordlike = sum(1 for t in tokens if _wordlike(t))
+    return max(0.0, (readable - bad) / len(chars)) * (wordlike / len(tokens))
+
+def _clamp_dpi(dpi: float) -> int:
+    return int(min(OCR_MAX_DPI, max(OCR_MIN_DPI, dpi)))
+
+def _glyph_size(page) -> Optional[float]:
+    """Median font size (points) of the page's text spans, weighted by length"""
+    sizes = []
+    for block in page.get_text("dict").get("blocks", []):
+        for line in block.get("lines", []):
+            for span in line.get("spans", []):
+                n = len(span.get("text", "").strip())
+                if n and span.get("size"):
+                    sizes.extend([span["size"]] * min(n, 50))
+    return median(sizes) if sizes else None
+
+def _scan_dpi(images) -> Optional[float]:
+    """Native resolution of the largest image, so OCR never upsamples a scan"""
+    best = None
+    for info in images:
+        bbox = info.get("bbox")
+        if not bbox or bbox[2] <= bbox[0]:
+            continue
+        dpi = info["width"] / ((bbox[2] - bbox[0]) / 72)
+        area = (bbox[2] - bbox[0]) * (bbox[3] - bbox[1])
+        if best is None or area > best[0]:
+            best = (area, dpi)
+    return best[1] if best else None
+
+def classify_page(page, text: str) -> PageClass:
+    """
+    Classify a page given its native text layer
+
+    Args:
+        page: PyMuPDF page
+        text: page.get_text("text") output
+
+    Returns:
+        PageClass with the action to take and, for OCR, the render DPI
+    """
+    page_area = abs(page.rect) or 1.0
+    images = page.get_image_info()
+    coverage = min(1.0, sum(abs(page.rect & fitz.Rect(i["bbox"])) for i in images) / page_area)
+    stripped = text.strip()
+
+    if stripped:
+        score = text_layer_score(stripped)
+        if score >= OCR_TEXT_SCORE_MIN and not (coverage >= 0.5 and len(stripped) < OCR_SPARSE_TEXT_CHARS):
+            return PageClass("text", text_score=score, reason="text_layer")
+        if score >= OCR_TEXT_SCORE_MIN:
+            # The few glyphs belong to a header/footer, not the scanned body
+            dpi = _clamp_dpi(_scan_dpi(images) or OCR_DEFAULT_DPI)
+            return PageClass("ocr", dpi=dpi, text_score=score, reason="sparse_text_over_scan")
+        # Broken font maps still carry correct glyph geometry
+        glyph = _glyph_size(page)
+        dpi = _clamp_dpi(OCR_TARGET_EM_PX * 72 / glyph if glyph else _scan_dpi(images) or OCR_DEFAULT_DPI)
+        return PageClass("ocr", dpi=dpi, text_score=score, reason="garbage_text_layer")
+
+    if coverage >= OCR_MIN_IMAGE_COVERAGE:
+        return PageClass("ocr", dpi=_clamp_dpi(_scan_dpi(images) or OCR_DEFAULT_DPI), reason="image_only")
+    if len(page.get_drawings()) >= OCR_OUTLINED_TEXT_PATHS:
+        return PageClass("ocr", dpi=OCR_DEFAULT_DPI, reason="outlined_text")
+    # Blank, or only a few rules/logos: rendering would find no text
+    return PageClass("skip", reason="blank" if not images else "graphics_only")
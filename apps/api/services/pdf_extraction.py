@@ -0,0 +1,296 @@
+"""
+PDF Text Extraction Service
+Fans per-page text extraction and OCR out across a process pool
+"""
+
+import os
+import time
+import math
+import asyncio
+import logging
+import functools
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from typing import BinaryIO, Callable, Dict, List, Optional, Tuple
+
+import fitz  # PyMuPDF
+import pytesseract
+from PIL import Image
+
+from .page_cache import PageTextCache, page_cache, page_fingerprint
+from .page_classifier import classify_page
+
+logger = logging.getLogger(__name__)
+
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(os.cpu_count() or 1)))
+# Documents shorter than this are extracted inline; pool start-up and
+# pickling cost more than they save on a couple of pages.
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "4"))
+# Uploads extracted at the same time; further uploads wait their turn so a
+# burst cannot queue more work than the process pool can chew through.
+PDF_MAX_CONCURRENT_EXTRACTIONS = int(os.getenv("PDF_MAX_CONCURRENT_EXTRACTIONS", "2"))
+# Render OCR pages as 8-bit grayscale: a third of the RGB pixmap size and
+# what tesseract binarizes to internally anyway.
+OCR_GRAYSCALE = os.getenv("OCR_GRAYSCALE", "true").lower() == "true"
+
+class InvalidPDFError(ValueError):
+    """Raised when the uploaded bytes cannot be opened as a PDF"""
+
+@dataclass
+class PageResult:
+    index: int
+    text: str
+    ocr: bool = False
+    ocr_ms: int = 0
+    page_ms: int = 0
+    cached: bool = False
+    error: Optional[str] = None
+    action: str = "text"  # text | ocr | skip, see page_classifier
+    dpi: Optional[int] = None
+    fingerprint: Optional[str] = None  # OCR cache key, set on pages pending OCR
+
+@dataclass
+class ExtractionResult:
+    page_count: int
+    pages: List[PageResult] = field(default_factory=list)
+
+    @property
+    def text_len(self) -> int:
+        return sum(len(p.text) + 1 for p in self.pages)
+
+    def write_text(self, fp: BinaryIO) -> List[int]:
+        """
+        Write the assembled text as UTF-8, page by page, without building one string
+
+        Returns:
+            Byte offset of the start of each page, plus the end offset
+        """
+        offsets = [0]
+        for p in self.pages:
+            data = p.text.encode("utf-8") + b"\n"
+            fp.write(data)
+            offsets.append(offsets[-1] + len(data))
+        return offsets
+
+    @property
+    def ocr_ms(self) -> int:
+        return sum(p.ocr_ms for p in self.pages)
+
+    @property
+    def page_ms(self) -> List[int]:
+        return [p.page_ms for p in self.pages]
+
+_pool: Optional[ProcessPoolExecutor] = None
+_dispatch_pool: Optional[ThreadPoolExecutor] = None
+# Dispatch threads race to create (and, after a crash, replace) the pool
+_pool_lock = threading.Lock()
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=PDF_EXTRACT_WORKERS)
+            logger.info(f"PDF extraction pool started with {PDF_EXTRACT_WORKERS} workers")
+        return _pool
+
+def _get_dispatch_pool() -> ThreadPoolExecutor:
+    global _dispatch_pool
+    if _dispatch_pool is None:
+        _dispatch_pool = ThreadPoolExecutor(
+            max_workers=PDF_MAX_CONCURRENT_EXTRACTIONS,
+            thread_name_prefix="pdf-extract",
+        )
+    return _dispatch_pool
+
+def _reset_pool(broken: Optional[ProcessPoolExecutor] = None):
+    """Drop the pool; with `broken`, only if it is still the current one"""
+    global _pool
+    with _pool_lock:
+        if _pool is None or (broken is not None and _pool is not broken):
+            # Already replaced by another thread that saw the same crash
+            return
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+def shutdown_pool():
+    """Stop the worker processes (called on application shutdown)"""
+    global _dispatch_pool
+    if _dispatch_pool is not None:
+        _dispatch_pool.shutdown(wait=False, cancel_futures=True)
+        _dispatch_pool = None
+    _reset_pool()
+
+def _pixmap_to_image(pix) -> Image.Image:
+    """
+    Wrap pixmap samples in a PIL image without copying or PNG-encoding them
+
+    The image shares the pixmap's buffer, so the pixmap must outlive it.
+    """
+    mode = "L" if pix.n == 1 else "RGB"
+    img = Image.frombuffer(mode, (pix.width, pix.height), pix.samples_mv, "raw", mode, pix.stride, 1)
+    # pytesseract hands images to the tesseract binary through a temp file in
+    # img.format (PNG when unset); PPM/PGM is an uncompressed write.
+    img.format = "PPM"
+    return img
+
+def _extract_page(page, index: int, fingerprint_doc=None) -> PageResult:
+    """
+    Text layer of one page, OCR'ing it when the classifier says so
+
+    With fingerprint_doc (OCR cache enabled) a page that needs OCR is not
+    rendered here: it comes back pending, with its cache fingerprint, so
+    the caller can look it up before paying for OCR.
+    """
+    t0 = time.time()
+    text = page.get_text("text") or ""
+    kind = classify_page(page, text)
+    if kind.action == "text":
+        return PageResult(index, text, page_ms=int((time.time() - t0) * 1000))
+    if kind.action == "skip":
+        return PageResult(index, "", action="skip", page_ms=int((time.time() - t0) * 1000))
+    if fingerprint_doc is not None:
+        return PageResult(index, "", action="ocr", dpi=kind.dpi, fingerprint=page_fingerprint(fingerprint_doc, page),
+                          page_ms=int((time.time() - t0) * 1000))
+    return _ocr_page(page, index, kind.dpi, t0)
+
+def _ocr_page(page, index: int, dpi: int, t0: Optional[float] = None) -> PageResult:
+    t0 = t0 or time.time()
+    try:
+        t_ocr = time.time()
+        colorspace = fitz.csGRAY if OCR_GRAYSCALE else fitz.csRGB
+        pix = page.get_pixmap(dpi=dpi, colorspace=colorspace, alpha=False)
+        text = pytesseract.image_to_string(_pixmap_to_image(pix)) or ""
+        del pix
+        ocr_ms = int((time.time() - t_ocr) * 1000)
+    except Exception as e:
+        print(f"OCR failed for page {index}: {e}")
+        return PageResult(index, f"[OCR failed for page {index}]", ocr=True, error=str(e), action="ocr",
+                          dpi=dpi, page_ms=int((time.time() - t0) * 1000))
+    return PageResult(index, text, ocr=True, ocr_ms=ocr_ms, action="ocr", dpi=dpi,
+                      page_ms=int((time.time() - t0) * 1000))
+
+def _pending(page: PageResult) -> bool:
+    # Classified for OCR but not OCR'd yet (see _extract_page)
+    return page.action == "ocr" and not page.ocr and not page.cached
+
+def _open_pdf(path: str):
+    # A path lets MuPDF read the file lazily instead of holding the whole
+    # PDF in memory, and is all that has to be pickled to worker processes.
+    return fitz.open(path, filetype="pdf")
+
+def _text_pages(doc, page_numbers: List[int], fingerprint: bool = False) -> List[PageResult]:
+    return [_extract_page(doc.load_page(i), i, doc if fingerprint else None) for i in page_numbers]
+
+def _ocr_pages(doc, pages: List[Tuple[int, int]]) -> List[PageResult]:
+    return [_ocr_page(doc.load_page(i), i, dpi) for i, dpi in pages]
+
+def _with_doc(func: Callable, source: str, items: list, *args) -> List[PageResult]:
+    """Worker entry point: run func on the given pages of one PDF"""
+    doc = _open_pdf(source)
+    try:
+        return func(doc, items, *args)
+    finally:
+        doc.close()
+
+def _batches(items: list, workers: int) -> List[list]:
+    # Two batches per worker keeps cores busy when OCR-heavy pages cluster
+    # together, without reopening the PDF for every single page.
+    size = max(1, math.ceil(len(items) / (workers * 2)))
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+def _run(doc, source: str, func: Callable, items: list,
+         collect: Callable[[List[PageResult]], None], *args) -> List[PageResult]:
+    """func over items: inline on the open doc for a few pages, else across the process pool"""
+    results: List[PageResult] = []
+    if len(items) < PDF_PARALLEL_MIN_PAGES or PDF_EXTRACT_WORKERS <= 1:
+        for item in items:
+            batch = func(doc, [item], *args)
+            results.extend(batch)
+            collect(batch)
+        return results
+    pool = _get_pool()
+    try:
+        futures = [pool.submit(_with_doc, func, source, batch, *args) for batch in _batches(items, PDF_EXTRACT_WORKERS)]
+        for fut in as_completed(futures):
+            batch = fut.result()
+            results.extend(batch)
+            collect(batch)
+    except BrokenProcessPool as e:
+        logger.error(f"PDF extraction pool broken, extracting inline: {e}")
+        _reset_pool(pool)
+        results = func(doc, items, *args)
+        collect(results)
+    return results
+
+# progress(pages_done, pages_total, ocr_ms_so_far)
+ProgressCallback = Callable[[int, int, int], None]
+
+def extract_pdf_text(source: str, cache: Optional[PageTextCache] = page_cache,
+                     progress: Optional[ProgressCallback] = None) -> ExtractionResult:
+    """
+    Extract text from every page of a PDF, OCR'ing image-only pages
+
+    With a cache this runs in two passes: the workers read every page's
+    text layer and fingerprint only the pages that need OCR, then the pages
+    missing from the cache go back to the workers to be OCR'd.
+
+    Args:
+        source: Path to the PDF on disk
+        cache: OCR page cache consulted before OCR (None disables it)
+        progress: Called from the extracting thread as pages complete
+
+    Returns:
+        ExtractionResult with pages in document order and per-page timings
+    """
+    try:
+        doc = _open_pdf(source)
+    except Exception as e:
+        raise InvalidPDFError(str(e))
+    page_count = doc.page_count
+
+    done: Dict[int, PageResult] = {}
+
+    def _collect(batch: List[PageResult]):
+        # Idempotent, so a batch redone after a broken pool is not counted twice
+        done.update((p.index, p) for p in batch if not _pending(p))
+        if progress is not None:
+            progress(len(done), page_count, sum(p.ocr_ms for p in done.values()))
+
+    try:
+        _collect([])
+        first = _run(doc, source, _text_pages, list(range(page_count)), _collect, cache is not None)
+
+        # Only OCR candidates reach the cache, so its hit rate is about OCR
+        todo: Dict[int, PageResult] = {}
+        for page in filter(_pending, first):
+            text = cache.get(page.fingerprint)
+            if text is None:
+                todo[page.index] = page
+            else:
+                _collect([PageResult(page.index, text, ocr=True, cached=True, action="ocr", page_ms=page.page_ms)])
+
+        ocred = _run(doc, source, _ocr_pages, [(i, page.dpi) for i, page in todo.items()], _collect)
+        for page in ocred:
+            page.page_ms += todo[page.index].page_ms
+            if page.error is None:
+                cache.put(todo[page.index].fingerprint, page.text)
+    finally:
+        doc.close()
+
+    return ExtractionResult(page_count, [done[i] for i in sorted(done)])
+
+async def extract_pdf_text_async(source: str, progress: Optional[ProgressCallback] = None) -> ExtractionResult:
+    """
+    Run extract_pdf_text without blocking the event loop
+
+    PDF parsing, rendering and OCR run on a small dispatch thread pool sized
+    by PDF_MAX_CONCURRENT_EXTRACTIONS, so at most that many uploads are
+    extracted at once and the rest queue.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _get_dispatch_pool(),
+        functools.partial(extract_pdf_text, source, progress=progress),
+    )
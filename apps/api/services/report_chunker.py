@@ -0,0 +1,167 @@
+"""
+Report Chunker
+Splits credit report text at account boundaries for chunked LLM extraction
+and merges the per-chunk results back into one report
+"""
+
+import os
+import re
+from typing import Dict, Iterable, List, Optional
+
+# Largest chunk sent to the model in one prompt; small models lose accuracy
+# well before their context window is full
+LLM_CHUNK_CHARS = int(os.getenv("LLM_CHUNK_CHARS", "4000"))
+
+# Lines that open a tradeline block in Experian/TransUnion/Equifax text
+_ACCOUNT_START = re.compile(
+    r"^[ \t]*(?:account\s+name|account\s+(?:number|no\.?|#)|acct\s*#|creditor(?:\s+name)?|"
+    r"company\s+name|collection\s+agency|original\s+creditor)\b",
+    re.IGNORECASE | re.MULTILINE,
+)
+_BLANK_LINES = re.compile(r"\n[ \t]*\n")
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+_DIGITS = re.compile(r"\d+")
+
+# Headings this close to the previous one belong to the same account block
+# ("Account Name" followed by "Account Number")
+_MIN_BLOCK_LINES = 3
+
+def _segments(text: str) -> List[str]:
+    """Text cut before every account block; the first segment is the preamble"""
+    bounds = [0]
+    for m in _ACCOUNT_START.finditer(text):
+        if m.start() > 0 and text.count("\n", bounds[-1], m.start()) >= _MIN_BLOCK_LINES:
+            bounds.append(m.start())
+    bounds.append(len(text))
+    return [text[a:b] for a, b in zip(bounds, bounds[1:]) if text[a:b].strip()]
+
+def _split_oversized(segment: str, max_chars: int) -> List[str]:
+    """Break a segment longer than max_chars at blank lines, then hard-wrap"""
+    pieces: List[str] = []
+    current = ""
+    for para in _BLANK_LINES.split(segment):
+        while len(para) > max_chars:
+            if current:
+                pieces.append(current)
+                current = ""
+            cut = para.rfind("\n", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            pieces.append(para[:cut])
+            para = para[cut:]
+        if current and len(current) + len(para) + 2 > max_chars:
+            pieces.append(current)
+            current = ""
+        current = f"{current}\n\n{para}" if current else para
+    if current.strip():
+        pieces.append(current)
+    return pieces
+
+def split_report(text: str, max_chars: int = LLM_CHUNK_CHARS) -> List[str]:
+    """
+    Split report text into chunks of at most max_chars
+
+    Chunks end at account boundaries, so a tradeline is only ever cut when
+    one account alone is longer than max_chars. Consecutive accounts are
+    packed into the same chunk to keep the number of model calls down.
+    """
+    chunks: List[str] = []
+    current = ""
+    for segment in _segments(text):
+        if len(segment) > max_chars:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.extend(_split_oversized(segment, max_chars))
+            continue
+        if current and len(current) + len(segment) > max_chars:
+            chunks.append(current)
+            current = ""
+        current += segment
+    if current.strip():
+        chunks.append(current)
+    return chunks
+
+def _norm(value) -> str:
+    return _NON_ALNUM.sub("", str(value or "").lower())
+
+def account_key(account: Dict) -> tuple:
+    """
+    Identity of an account across chunks
+
+    The same tradeline can be reported by two chunks (it straddled a
+    boundary), so accounts are matched on creditor plus the whole account
+    number as printed, masking included: bureaus often mask the trailing
+    digits ("517805XXXXXX"), so any fixed suffix would be shared by every
+    card from the issuer. Falls back to type and balance when no number
+    was extracted.
+    """
+    creditor = _norm(account.get("creditor_name") or account.get("creditor"))
+    number = _norm(account.get("account_number"))
+    if number:
+        return creditor, number
+    return creditor, _norm(account.get("account_type")), str(account.get("balance") or "")
+
+def _merge_dict(into: Dict, other: Dict):
+    # Fill in what the first sighting left empty; never overwrite values
+    for key, value in other.items():
+        if into.get(key) in (None, "", [], {}) and value not in (None, "", [], {}):
+            into[key] = value
+
+def _dedup_across_chunks(chunk_items: Iterable[Optional[List]], key) -> List[Dict]:
+    """
+    Flatten per-chunk lists, merging an item only into a match from the
+    previous chunk
+
+    Duplicates come from a tradeline cut by a chunk boundary, so they can
+    only be in adjacent chunks; items inside one chunk are always distinct
+    (several $0 loans from one servicer look alike but are real accounts).
+    Each earlier item absorbs at most one duplicate. None marks a failed
+    chunk, which breaks adjacency.
+    """
+    items: List[Dict] = []
+    previous: Dict[tuple, List[Dict]] = {}
+    for chunk in chunk_items:
+        current: Dict[tuple, List[Dict]] = {}
+        for item in chunk or []:
+            if not isinstance(item, dict):
+                continue
+            k = key(item)
+            matches = previous.get(k)
+            if matches:
+                target = matches.pop(0)
+                _merge_dict(target, item)
+            else:
+                target = dict(item)
+                items.append(target)
+            current.setdefault(k, []).append(target)
+        previous = current
+    return items
+
+def _dispute_key(dispute: Dict) -> tuple:
+    return (_norm(dispute.get("account_name") or dispute.get("creditor")),
+            _norm(dispute.get("reason_code")))
+
+def merge_extractions(results: Iterable[Optional[Dict]], bureau: str) -> Optional[Dict]:
+    """
+    Combine per-chunk extraction results into one report
+
+    Accounts and dispute opportunities keep the order they appear in the
+    report and are only deduplicated across neighbouring chunks; scalar
+    fields take the first non-empty value in chunk order (the score is in
+    the preamble, i.e. the first chunk). Returns None if no chunk produced
+    a result.
+    """
+    results = [result or None for result in results]
+    if not any(results):
+        return None
+    merged: Dict = {}
+    for result in results:
+        if result:
+            _merge_dict(merged, {k: v for k, v in result.items()
+                                 if k not in ("accounts", "dispute_opportunities")})
+    merged["bureau"] = merged.get("bureau") or bureau
+    merged["accounts"] = _dedup_across_chunks(
+        [(result.get("accounts") or []) if result else None for result in results], account_key)
+    merged["dispute_opportunities"] = _dedup_across_chunks(
+        [(result.get("dispute_opportunities") or []) if result else None for result in results], _dispute_key)
+    return merged
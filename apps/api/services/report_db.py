@@ -0,0 +1,87 @@
+"""
+Credit Report Persistence
+Stores ingested reports and their parsed analysis in the credit_reports table
+"""
+
+import uuid
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from apps.api.models.base import engine, get_db_session
+from apps.api.models import users  # noqa: F401 - registers users for the user_id foreign key
+from apps.api.models.reports import CreditReport
+
+logger = logging.getLogger(__name__)
+
+def _report_uuid(report_id: str) -> Optional[uuid.UUID]:
+    # Reports from before ingestion used UUIDs may have other ids; those
+    # simply aren't persisted
+    try:
+        return uuid.UUID(report_id)
+    except (ValueError, TypeError):
+        return None
+
+def ensure_schema():
+    """Create credit_reports (and its indexes) if missing; migrations do this in production"""
+    try:
+        CreditReport.__table__.create(bind=engine, checkfirst=True)
+    except Exception as e:
+        logger.error(f"Could not create credit_reports table: {e}")
+
+def save_reports(recs: List[Dict]):
+    """
+    Insert report rows in one round trip
+
+    Upload has no user context and the bureau is only known once the
+    report is analysed (save_parsed sets it), so new rows carry just the id
+    and created_at; the PDF itself is not retained, so there is no
+    raw_pdf_url. The user_id and report_date indexes are for when those
+    columns get populated.
+    """
+    rows = []
+    for rec in recs:
+        rid = _report_uuid(rec["id"])
+        if rid is None:
+            continue
+        rows.append({
+            "id": rid,
+            "created_at": datetime.fromisoformat(rec["created_at"]),
+        })
+    if not rows:
+        return
+    with get_db_session() as db:
+        db.bulk_insert_mappings(CreditReport, rows)
+        db.commit()
+
+def get_parsed(report_id: str) -> Optional[Dict]:
+    """Stored analysis for a report (primary-key read), or None"""
+    rid = _report_uuid(report_id)
+    if rid is None:
+        return None
+    with get_db_session() as db:
+        row = db.query(CreditReport.parsed_json).filter(CreditReport.id == rid).first()
+    return row[0] if row else None
+
+def save_parsed(report_id: str, parsed: Dict, bureau: Optional[str] = None):
+    """Store (or replace) the analysis for a report, creating its row if needed"""
+    rid = _report_uuid(report_id)
+    if rid is None:
+        return
+    with get_db_session() as db:
+        report = db.get(CreditReport, rid)
+        if report is None:
+            report = CreditReport(id=rid, created_at=datetime.now())
+            db.add(report)
+        report.parsed_json = parsed
+        if bureau:
+            report.bureau = bureau
+        db.commit()
+
+def delete_report(report_id: str):
+    rid = _report_uuid(report_id)
+    if rid is None:
+        return
+    with get_db_session() as db:
+        db.query(CreditReport).filter(CreditReport.id == rid).delete()
+        db.commit()
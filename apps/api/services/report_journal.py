@@ -0,0 +1,161 @@
+"""
+Report Journal
+Append-only JSON Lines persistence for report metadata
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+REPORTS_JOURNAL_PATH = os.getenv("REPORTS_JOURNAL_PATH", "./apps/api/reports.jsonl")
+# always: fsync every append (durable, slowest)
+# interval: fsync at most every REPORTS_JOURNAL_FSYNC_INTERVAL seconds (a
+#           timer syncs whatever the last appends left unsynced)
+# never: leave it to the OS page cache
+REPORTS_JOURNAL_FSYNC = os.getenv("REPORTS_JOURNAL_FSYNC", "always").lower()
+REPORTS_JOURNAL_FSYNC_INTERVAL = float(os.getenv("REPORTS_JOURNAL_FSYNC_INTERVAL", "1.0"))
+# Rewrite the journal once it holds this many times more entries than live
+# records (and at least REPORTS_JOURNAL_COMPACT_MIN entries)
+REPORTS_JOURNAL_COMPACT_RATIO = float(os.getenv("REPORTS_JOURNAL_COMPACT_RATIO", "2.0"))
+REPORTS_JOURNAL_COMPACT_MIN = int(os.getenv("REPORTS_JOURNAL_COMPACT_MIN", "1000"))
+
+class ReportJournal:
+    """
+    Journal of {"op": "put", "rec": {...}} / {"op": "del", "id": ...} lines
+
+    Appends are O(1); replaying the file on startup rebuilds the live set.
+    A torn final line from a crash mid-write is truncated away on replay.
+    Appends and compaction block on disk I/O; call them off the event loop.
+    """
+
+    def __init__(self, path: str = REPORTS_JOURNAL_PATH, fsync: str = REPORTS_JOURNAL_FSYNC,
+                 fsync_interval: float = REPORTS_JOURNAL_FSYNC_INTERVAL):
+        self.path = path
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.entries = 0
+        self._lock = threading.Lock()
+        self._fp = None
+        self._last_sync = 0.0
+        self._timer: Optional[threading.Timer] = None
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def replay(self) -> List[dict]:
+        """Read the journal and return the live records in journal order"""
+        live: Dict[str, dict] = {}
+        self.entries = 0
+        if not self.exists():
+            return []
+
+        good_offset = 0
+        with open(self.path, "rb") as f:
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    # Torn write: the process died before finishing this line
+                    logger.warning(f"Discarding incomplete trailing entry in {self.path}")
+                    break
+                try:
+                    entry = json.loads(raw)
+                except ValueError:
+                    logger.warning(f"Skipping corrupt entry at byte {good_offset} in {self.path}")
+                    good_offset += len(raw)
+                    continue
+                good_offset += len(raw)
+                self.entries += 1
+                if entry.get("op") == "put":
+                    live.pop(entry["rec"]["id"], None)
+                    live[entry["rec"]["id"]] = entry["rec"]
+                elif entry.get("op") == "del":
+                    live.pop(entry["id"], None)
+
+        if good_offset < os.path.getsize(self.path):
+            with open(self.path, "r+b") as f:
+                f.truncate(good_offset)
+        return list(live.values())
+
+    def append_put(self, rec: dict):
+        self._append({"op": "put", "rec": rec})
+
+    def append_delete(self, report_id: str):
+        self._append({"op": "del", "id": report_id})
+
+    def needs_compaction(self, live_count: int) -> bool:
+        return (self.entries >= REPORTS_JOURNAL_COMPACT_MIN
+                and self.entries > live_count * REPORTS_JOURNAL_COMPACT_RATIO)
+
+    def compact(self, records: Iterable[dict]):
+        """Atomically rewrite the journal as one put per live record"""
+        with self._lock:
+            self._close_fp()
+            tmp = f"{self.path}.tmp"
+            count = 0
+            with open(tmp, "w", encoding="utf-8") as f:
+                for rec in records:
+                    f.write(json.dumps({"op": "put", "rec": rec}) + "\n")
+                    count += 1
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+            self._sync_dir()
+            self.entries = count
+        logger.info(f"Compacted {self.path} to {count} entries")
+
+    def close(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if self._fp is not None and self.fsync != "never":
+                self._fp.flush()
+                os.fsync(self._fp.fileno())
+            self._close_fp()
+
+    def _append(self, entry: dict):
+        line = json.dumps(entry) + "\n"
+        with self._lock:
+            if self._fp is None:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                self._fp = open(self.path, "a", encoding="utf-8")
+            self._fp.write(line)
+            self._fp.flush()
+            now = time.time()
+            if self.fsync == "always" or (self.fsync == "interval" and now - self._last_sync >= self.fsync_interval):
+                os.fsync(self._fp.fileno())
+                self._last_sync = now
+            elif self.fsync == "interval" and self._timer is None:
+                self._timer = threading.Timer(self.fsync_interval - (now - self._last_sync), self._timed_sync)
+                self._timer.daemon = True
+                self._timer.start()
+            self.entries += 1
+
+    def _timed_sync(self):
+        with self._lock:
+            self._timer = None
+            if self._fp is not None:
+                os.fsync(self._fp.fileno())
+                self._last_sync = time.time()
+
+    def _close_fp(self):
+        if self._fp is not None:
+            self._fp.close()
+            self._fp = None
+
+    def _sync_dir(self):
+        # Make the rename itself durable (no-op where directories can't be opened)
+        try:
+            fd = os.open(os.path.dirname(os.path.abspath(self.path)), os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
@@ -0,0 +1,159 @@
+"""
+Report Registry
+In-memory index of report metadata records, optionally backed by a journal
+"""
+
+import bisect
+import threading
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from .report_journal import ReportJournal
+
+# Sortable fields -> total-order key (ties broken by id)
+SORT_KEYS: Dict[str, Callable[[dict], tuple]] = {
+    "created_at": lambda r: (r["created_at"], r["id"]),
+    "filename": lambda r: (r.get("filename") or "", r["id"]),
+}
+
+def is_sort_key(sort: str, key) -> bool:
+    """Whether `key` (e.g. decoded from a cursor) has the shape SORT_KEYS[sort] produces"""
+    # Every sort key is (string field, id)
+    return sort in SORT_KEYS and isinstance(key, (list, tuple)) and len(key) == 2 \
+        and all(isinstance(part, str) for part in key)
+
+class ReportRegistry:
+    """
+    Report records indexed by id, content hash, filename and creation time
+
+    Lookups and deletes by id are dict operations; each field in SORT_KEYS
+    has a sorted list of (sort key, id) kept with bisect, so listing a page
+    in order never sorts the whole registry and a keyset cursor resumes
+    with a binary search.
+
+    With a journal, every add/remove is appended to it and the journal is
+    compacted once dead entries dominate; `records` passed at construction
+    are assumed to already be persisted.
+    """
+
+    def __init__(self, records: Iterable[dict] = (), journal: Optional[ReportJournal] = None):
+        self._lock = threading.RLock()
+        self._by_id: Dict[str, dict] = {}
+        self._by_sha: Dict[str, str] = {}
+        self._by_filename: Dict[str, Set[str]] = defaultdict(set)
+        self._sorted: Dict[str, List[Tuple[tuple, str]]] = {name: [] for name in SORT_KEYS}
+        self.journal = journal
+        for rec in records:
+            self._index(rec)
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def __contains__(self, report_id: str) -> bool:
+        return report_id in self._by_id
+
+    def __iter__(self) -> Iterator[dict]:
+        """Records in creation order"""
+        with self._lock:
+            ids = [rid for _, rid in self._sorted["created_at"]]
+        return (self._by_id[rid] for rid in ids if rid in self._by_id)
+
+    def add(self, rec: dict):
+        with self._lock:
+            self._index(rec)
+            if self.journal is not None:
+                self.journal.append_put(rec)
+                self._maybe_compact()
+
+    def get(self, report_id: str) -> Optional[dict]:
+        return self._by_id.get(report_id)
+
+    def remove(self, report_id: str) -> Optional[dict]:
+        with self._lock:
+            rec = self._unindex(report_id)
+            if rec is not None and self.journal is not None:
+                self.journal.append_delete(report_id)
+                self._maybe_compact()
+            return rec
+
+    def close(self):
+        if self.journal is not None:
+            self.journal.close()
+
+    def find_by_sha(self, sha256: str) -> Optional[dict]:
+        rid = self._by_sha.get(sha256)
+        return self._by_id.get(rid) if rid else None
+
+    def find_by_filename(self, filename: str) -> List[dict]:
+        with self._lock:
+            recs = [self._by_id[rid] for rid in self._by_filename.get(filename, ())]
+        return sorted(recs, key=lambda r: (r["created_at"], r["id"]))
+
+    def page(self, sort: str = "created_at", descending: bool = False, offset: int = 0,
+             limit: Optional[int] = None, after: Optional[tuple] = None) -> List[dict]:
+        """
+        One page of records in `sort` order
+
+        Args:
+            sort: A SORT_KEYS field
+            descending: Reverse order
+            offset: Records to skip (after the cursor, if any)
+            limit: Page size; None for everything
+            after: Sort key of the last record of the previous page
+
+        Returns:
+            Records in order
+        """
+        with self._lock:
+            return [self._by_id[rid] for _, rid in _slice(self._sorted[sort], descending, offset, limit, after)]
+
+    def sort_key(self, sort: str, rec: dict) -> tuple:
+        return SORT_KEYS[sort](rec)
+
+    def _index(self, rec: dict):
+        with self._lock:
+            if rec["id"] in self._by_id:
+                self._unindex(rec["id"])
+            self._by_id[rec["id"]] = rec
+            if rec.get("sha256"):
+                self._by_sha[rec["sha256"]] = rec["id"]
+            self._by_filename[rec.get("filename")].add(rec["id"])
+            for name, key in SORT_KEYS.items():
+                bisect.insort(self._sorted[name], (key(rec), rec["id"]))
+
+    def _unindex(self, report_id: str) -> Optional[dict]:
+        with self._lock:
+            rec = self._by_id.pop(report_id, None)
+            if rec is None:
+                return None
+            if rec.get("sha256") and self._by_sha.get(rec["sha256"]) == report_id:
+                del self._by_sha[rec["sha256"]]
+            ids = self._by_filename.get(rec.get("filename"))
+            if ids is not None:
+                ids.discard(report_id)
+                if not ids:
+                    del self._by_filename[rec.get("filename")]
+            for name, key in SORT_KEYS.items():
+                index, entry = self._sorted[name], (key(rec), report_id)
+                i = bisect.bisect_left(index, entry)
+                if i < len(index) and index[i] == entry:
+                    del index[i]
+            return rec
+
+    def _maybe_compact(self):
+        if self.journal.needs_compaction(len(self._by_id)):
+            self.journal.compact(self._by_id[rid] for _, rid in self._sorted["created_at"])
+
+def _slice(index: list, descending: bool, offset: int, limit: Optional[int], after: Optional[tuple]) -> list:
+    """Slice a sorted [(key, id)] index, resuming after the keyset cursor `after`"""
+    # Every key ends with the record id, so (after, after[-1]) is exactly the
+    # index entry of the cursor record, whether or not it still exists.
+    if descending:
+        end = len(index) if after is None else bisect.bisect_left(index, (after,))
+        end -= offset
+        start = 0 if limit is None else max(0, end - limit)
+        return index[start:max(0, end)][::-1]
+    start = 0 if after is None else bisect.bisect_right(index, (after, after[-1]))
+    start += offset
+    end = len(index) if limit is None else start + limit
+    return index[start:end]
@@ -0,0 +1,171 @@
+"""
+Report Search Index
+SQLite FTS5 full-text index over extracted report text, one row per page
+"""
+
+import os
+import re
+import sqlite3
+import logging
+import threading
+from typing import Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+REPORT_SEARCH_DB = os.getenv("REPORT_SEARCH_DB", "./apps/api/report_search.db")
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+class SearchUnavailableError(RuntimeError):
+    """Raised when the SQLite build has no FTS5 support"""
+
+def to_match_query(query: str) -> str:
+    """
+    Turn free text into a safe FTS5 MATCH expression
+
+    Every word must appear (implicit AND); each is quoted so user input can
+    never be parsed as FTS5 operators or column filters.
+    """
+    return " ".join(f'"{token}"' for token in _TOKEN.findall(query))
+
+class ReportSearchIndex:
+    """
+    Full-text index of report pages
+
+    Pages are indexed separately so a hit can point at the page it came
+    from and indexing never needs the whole report text in one string.
+    Results are ranked by the best-matching page of each report (bm25).
+    """
+
+    def __init__(self, path: str = REPORT_SEARCH_DB):
+        self.path = path
+        self.available = True
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        try:
+            self._conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS report_pages USING fts5("
+                "report_id UNINDEXED, page UNINDEXED, body, tokenize='unicode61 remove_diacritics 2')"
+            )
+        except sqlite3.OperationalError as e:
+            logger.error(f"Report search disabled, SQLite has no FTS5: {e}")
+            self.available = False
+            return
+        # A report's pages are inserted in one transaction, so their rowids
+        # are contiguous; remembering the range makes deletes a rowid range
+        # instead of a scan over an UNINDEXED column
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS indexed_reports ("
+            "report_id TEXT PRIMARY KEY, first_rowid INTEGER, last_rowid INTEGER)"
+        )
+        self._conn.commit()
+
+    def index_pages(self, report_id: str, pages: Iterable[str]):
+        """Replace the indexed text of a report; page numbers are 1-based"""
+        if not self.available:
+            return
+        with self._lock, self._conn:
+            self._delete(report_id)
+            first = last = None
+            for i, text in enumerate(pages, start=1):
+                if not text.strip():
+                    continue
+                cur = self._conn.execute(
+                    "INSERT INTO report_pages (report_id, page, body) VALUES (?, ?, ?)", (report_id, i, text)
+                )
+                first = cur.lastrowid if first is None else first
+                last = cur.lastrowid
+            self._conn.execute(
+                "INSERT INTO indexed_reports (report_id, first_rowid, last_rowid) VALUES (?, ?, ?)",
+                (report_id, first, last),
+            )
+
+    def remove(self, report_id: str):
+        if not self.available:
+            return
+        with self._lock, self._conn:
+            self._delete(report_id)
+
+    def indexed_ids(self) -> set:
+        if not self.available:
+            return set()
+        with self._lock:
+            return {row[0] for row in self._conn.execute("SELECT report_id FROM indexed_reports")}
+
+    def _delete(self, report_id: str):
+        row = self._conn.execute(
+            "SELECT first_rowid, last_rowid FROM indexed_reports WHERE report_id = ?", (report_id,)
+        ).fetchone()
+        if row is None:
+            return
+        if row[0] is not None:
+            self._conn.execute("DELETE FROM report_pages WHERE rowid BETWEEN ? AND ?", row)
+        self._conn.execute("DELETE FROM indexed_reports WHERE report_id = ?", (report_id,))
+
+    def search(self, query: str, limit: int = 20, offset: int = 0) -> List[Dict]:
+        """
+        Reports matching every word of `query`, best first
+
+        Returns:
+            [{"report_id", "page", "score", "snippet"}]; score is bm25
+            (lower is better) of the report's best page
+        """
+        if not self.available:
+            raise SearchUnavailableError("Full-text search is not available")
+        match = to_match_query(query)
+        if not match:
+            return []
+        with self._lock:
+            # SQLite returns the bare columns of the row that holds min(score);
+            # the inner LIMIT keeps the FTS subquery from being flattened into
+            # the aggregate, where bm25() cannot run
+            best = self._conn.execute(
+                "SELECT report_id, page, rowid, min(score) FROM ("
+                "  SELECT report_id, page, rowid, bm25(report_pages) AS score"
+                "  FROM report_pages WHERE report_pages MATCH ? LIMIT -1"
+                ") GROUP BY report_id ORDER BY min(score) LIMIT ? OFFSET ?",
+                (match, limit, offset),
+            ).fetchall()
+            results = []
+            for report_id, page, rowid, score in best:
+                snippet = self._conn.execute(
+                    "SELECT snippet(report_pages, 2, '[', ']', '...', 16) FROM report_pages "
+                    "WHERE report_pages MATCH ? AND rowid = ?",
+                    (match, rowid),
+                ).fetchone()
+                results.append({
+                    "report_id": report_id,
+                    "page": page,
+                    "score": round(score, 4),
+                    "snippet": snippet[0] if snippet else "",
+                })
+        return results
+
+    def backfill(self, report_ids: Iterable[str], load_pages: Callable[[str], Optional[List[str]]]) -> int:
+        """Index reports that are not in the index yet; returns how many were added"""
+        if not self.available:
+            return 0
+        known = self.indexed_ids()
+        added = 0
+        for report_id in report_ids:
+            if report_id in known:
+                continue
+            try:
+                pages = load_pages(report_id)
+            except Exception as e:
+                logger.warning(f"Could not index report {report_id}: {e}")
+                continue
+            if pages:
+                self.index_pages(report_id, pages)
+                added += 1
+        return added
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+# Global instance
+search_index = ReportSearchIndex()
@@ -0,0 +1,173 @@
+"""
+Report Text Store
+Sharded, optionally compressed on-disk storage for extracted report text
+"""
+
+import os
+import io
+import gzip
+import hashlib
+import logging
+import tempfile
+from contextlib import contextmanager
+from typing import BinaryIO, Iterator, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:  # optional: only needed for REPORT_TEXT_COMPRESSION=zstd
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+REPORT_TEXT_DIR = os.getenv("REPORT_TEXT_DIR", "./report_texts")
+# none | gzip | zstd; applies to new writes, existing files are read as stored
+REPORT_TEXT_COMPRESSION = os.getenv("REPORT_TEXT_COMPRESSION", "none").lower()
+REPORT_TEXT_COMPRESSION_LEVEL = int(os.getenv("REPORT_TEXT_COMPRESSION_LEVEL", "6"))
+# Where text lived before the store: flat ./report_{id}.txt files
+REPORT_TEXT_LEGACY_DIR = os.getenv("REPORT_TEXT_LEGACY_DIR", ".")
+
+_SUFFIXES = {"none": ".txt", "gzip": ".txt.gz", "zstd": ".txt.zst"}
+
+class ReportTextStore:
+    """
+    Report text files under <root>/<aa>/<bb>/<id>.txt[.gz|.zst]
+
+    The two shard levels come from a hash of the report id, giving 65536
+    leaf directories, so a million reports is ~15 files per directory.
+    Writes go to a temp file in the target directory and are renamed into
+    place, so readers never see a partial file.
+    """
+
+    def __init__(self, root: str = REPORT_TEXT_DIR, compression: str = REPORT_TEXT_COMPRESSION,
+                 level: int = REPORT_TEXT_COMPRESSION_LEVEL, legacy_dir: Optional[str] = REPORT_TEXT_LEGACY_DIR):
+        if compression not in _SUFFIXES:
+            raise ValueError(f"Unknown REPORT_TEXT_COMPRESSION: {compression}")
+        if compression == "zstd" and zstandard is None:
+            logger.warning("zstandard is not installed, storing report text with gzip instead")
+            compression = "gzip"
+        self.root = root
+        self.compression = compression
+        self.level = level
+        self.legacy_dir = legacy_dir
+
+    def shard_dir(self, report_id: str) -> str:
+        digest = hashlib.sha1(report_id.encode("utf-8")).hexdigest()
+        return os.path.join(self.root, digest[:2], digest[2:4])
+
+    def path_for(self, report_id: str, compression: Optional[str] = None) -> str:
+        return os.path.join(self.shard_dir(report_id), report_id + _SUFFIXES[compression or self.compression])
+
+    def legacy_path(self, report_id: str) -> Optional[str]:
+        if self.legacy_dir is None:
+            return None
+        return os.path.join(self.legacy_dir, f"report_{report_id}.txt")
+
+    def locate(self, report_id: str) -> Optional[Tuple[str, str]]:
+        """(path, compression) of the stored text, or None"""
+        for compression in (self.compression, *(c for c in _SUFFIXES if c != self.compression)):
+            path = self.path_for(report_id, compression)
+            if os.path.exists(path):
+                return path, compression
+        legacy = self.legacy_path(report_id)
+        if legacy and os.path.exists(legacy):
+            return legacy, "none"
+        return None
+
+    def exists(self, report_id: str) -> bool:
+        return self.locate(report_id) is not None
+
+    @contextmanager
+    def open_write(self, report_id: str) -> Iterator[BinaryIO]:
+        """Binary writer for a report's UTF-8 text, committed atomically on exit"""
+        path = self.path_for(report_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=f".{report_id}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as raw:
+                if self.compression == "gzip":
+                    with gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=self.level, mtime=0) as out:
+                        yield out
+                elif self.compression == "zstd":
+                    cctx = zstandard.ZstdCompressor(level=self.level)
+                    with cctx.stream_writer(raw, closefd=False) as out:
+                        yield out
+                else:
+                    yield raw
+                raw.flush()
+                os.fsync(raw.fileno())
+            os.replace(tmp, path)
+        except BaseException:
+            os.remove(tmp)
+            raise
+        self._remove_other_copies(report_id, keep=path)
+
+    def open_read(self, report_id: str) -> BinaryIO:
+        """
+        Binary reader over the uncompressed text (forward seek supported)
+
+        Raises:
+            FileNotFoundError: No text stored for this report
+        """
+        found = self.locate(report_id)
+        if found is None:
+            raise FileNotFoundError(report_id)
+        path, compression = found
+        if compression == "gzip":
+            return gzip.open(path, "rb")
+        if compression == "zstd":
+            if zstandard is None:
+                raise RuntimeError("zstandard is required to read " + path)
+            return zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+        return open(path, "rb")
+
+    def read_text(self, report_id: str) -> str:
+        # Universal newlines: legacy files written in text mode on Windows are CRLF
+        with io.TextIOWrapper(self.open_read(report_id), encoding="utf-8") as f:
+            return f.read()
+
+    def stat(self, report_id: str) -> Optional[os.stat_result]:
+        """os.stat of the stored file (compressed size for compressed files)"""
+        found = self.locate(report_id)
+        return os.stat(found[0]) if found else None
+
+    def text_size(self, report_id: str) -> Optional[int]:
+        """Uncompressed size in bytes"""
+        found = self.locate(report_id)
+        if found is None:
+            return None
+        path, compression = found
+        if compression == "none":
+            return os.path.getsize(path)
+        if compression == "gzip" and os.path.getsize(path) < 2 ** 32:
+            # ISIZE trailer: uncompressed length mod 2^32
+            with open(path, "rb") as f:
+                f.seek(-4, os.SEEK_END)
+                return int.from_bytes(f.read(4), "little")
+        size = 0
+        with self.open_read(report_id) as f:
+            while chunk := f.read(1024 * 1024):
+                size += len(chunk)
+        return size
+
+    def delete(self, report_id: str) -> bool:
+        removed = False
+        for path in self._all_paths(report_id):
+            try:
+                os.remove(path)
+                removed = True
+            except FileNotFoundError:
+                pass
+        return removed
+
+    def _all_paths(self, report_id: str):
+        paths = [self.path_for(report_id, c) for c in _SUFFIXES]
+        legacy = self.legacy_path(report_id)
+        return paths + [legacy] if legacy else paths
+
+    def _remove_other_copies(self, report_id: str, keep: str):
+        for path in self._all_paths(report_id):
+            if path != keep and os.path.exists(path):
+                os.remove(path)
+
+# Global instance
+text_store = ReportTextStore()
@@ -0,0 +1,4 @@
+-- Upload does not populate user_id or report_date yet (no user context at
+-- ingestion); these indexes serve per-user and by-date lookups once it does.
+create index if not exists ix_credit_reports_user_id on credit_reports (user_id);
+create index if not exists ix_credit_reports_report_date on credit_reports (report_date);